@@ -0,0 +1,86 @@
+from typing import Dict, List, Optional
+import os
+import time
+import asyncio
+import logging
+from .fetch_planner import plan_fetches, execute_plan
+from .utils import DEFAULT_TERM
+
+
+class BackfillQueue:
+    """Fills in course info for watches that were rendered without it, off the request path
+
+    A watch is tried at most once every BACKFILL_RETRY_SECONDS, however often
+    it's rendered, so page traffic can't drive upstream calls.
+    """
+
+    def __init__(self, db, howdy, engine, watch_set=None):
+        self.db = db
+        self.watch_set = watch_set
+        self.howdy = howdy
+        self.engine = engine
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.queued = set()
+        self.retry_seconds = float(os.getenv("BACKFILL_RETRY_SECONDS", "600"))
+        # Monotonic time of each watch's last attempt, within retry_seconds
+        self.attempted: Dict = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def enqueue(self, watch: Dict):
+        if watch['_id'] in self.queued:
+            return
+        if time.monotonic() - self.attempted.get(watch['_id'], float("-inf")) < self.retry_seconds:
+            return
+        self.queued.add(watch['_id'])
+        self.queue.put_nowait(watch)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            # Take everything queued so far so watches of one course share a fetch
+            batch = [await self.queue.get()]
+            while not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            now = time.monotonic()
+            self.attempted = {
+                watch_id: at for watch_id, at in self.attempted.items() if now - at < self.retry_seconds
+            }
+            try:
+                await self._fill(batch)
+            except Exception as e:
+                logging.error(f"Backfill of {len(batch)} watches failed: {e}")
+            finally:
+                for watch in batch:
+                    self.queued.discard(watch['_id'])
+                    self.attempted[watch['_id']] = now
+
+    async def _fill(self, watches: List[Dict]):
+        plan = plan_fetches(watches)
+        results = await execute_plan(plan, self.howdy.get_course_sections, self.engine)
+
+        by_term = {}
+        links = []
+        for watch, sections in plan.fan_out(results):
+            if sections:
+                by_term.setdefault(watch.get('term', DEFAULT_TERM), {}).update((s['CRN'], s) for s in sections)
+            # Linked even when empty, so the watch isn't picked up for backfill again
+            links.append((watch['_id'], [s['CRN'] for s in sections]))
+
+        for term, sections in by_term.items():
+            await self.db.upsert_sections(term, list(sections.values()), overwrite=False)
+        await self.db.link_watches(links)
+        if links and self.watch_set:
+            await self.watch_set.mark_changed()
+        logging.info(f"Backfilled course info for {len(links)} of {len(watches)} watches")
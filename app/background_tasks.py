@@ -1,37 +1,104 @@
+from typing import Dict, List, Optional
+import os
+import socket
+import uuid
+import asyncio
 import logging
-from datetime import datetime
-from typing import Optional, List
-
-async def initialize_watch(watch_id: str, db, email_sender, get_course_sections):
-    """Initialize a new course watch by fetching initial data and sending confirmation email"""
-    try:
-        # Get watch details
-        watch = await db.get_watch_by_id(watch_id)
-        if not watch:
-            logging.error(f"Watch {watch_id} not found")
-            return
-        
-        # Fetch initial course data
-        sections = await get_course_sections(
-            subject=watch.get('subject'),
-            course_number=watch.get('course_number'),
-            crns=watch.get('crns')
-        )
-        
-        if sections:
-            # Update watch with course info
-            await db.update_course_info(watch_id, sections)
-            
-            # Send confirmation email
-            await email_sender.send_confirmation_email(watch['email'], sections)
-            
-            # Update status to active
-            await db.update_watch_status(watch_id, "active")
-        else:
-            logging.error(f"No sections found for watch {watch_id}")
-            await db.update_watch_status(watch_id, "failed")
-            
-    except Exception as e:
-        logging.error(f"Error initializing watch {watch_id}: {e}")
-        # Update watch status to failed
-        await db.update_watch_status(watch_id, "failed") 
\ No newline at end of file
+from .fetch_planner import plan_fetches, execute_plan
+from .utils import DEFAULT_TERM
+
+
+class InitQueue:
+    """Initializes new watches in batches, using `status: initializing` as a durable queue
+
+    Watches are claimed with an expiring lease, so ones left behind by a worker
+    restart are picked up again once their claim runs out.
+    """
+
+    def __init__(self, db, howdy, email_sender, engine, outbox=None, watch_set=None):
+        self.db = db
+        self.watch_set = watch_set
+        self.howdy = howdy
+        self.email_sender = email_sender
+        self.engine = engine
+        self.outbox = outbox
+        self.batch_size = int(os.getenv("INIT_BATCH_SIZE", "200"))
+        self.poll_interval = float(os.getenv("INIT_POLL_SECONDS", "2"))
+        self.claim_seconds = float(os.getenv("INIT_CLAIM_SECONDS", "120"))
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def notify(self):
+        """Wake the consumer after adding watches from this process"""
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            # Cleared before claiming so a notify() during a batch isn't lost
+            self._wakeup.clear()
+            try:
+                watches = await self.db.claim_initializing_watches(self.owner, self.batch_size, self.claim_seconds)
+                if watches:
+                    await self.initialize(watches)
+                    # A full batch probably means more are waiting
+                    if len(watches) == self.batch_size:
+                        continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Watch initialization batch failed: {e}")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def initialize(self, watches: List[Dict]):
+        """Fetch once per distinct course, store sections, activate watches and queue confirmations"""
+        plan = plan_fetches(watches)
+        results = await execute_plan(plan, self.howdy.get_course_sections, self.engine)
+
+        by_term = {}
+        active = []
+        failed = [watch['_id'] for watch in plan.skipped]
+        messages = []
+        for watch, sections in plan.fan_out(results):
+            if not sections:
+                logging.error(f"No sections found for watch {watch['_id']}")
+                failed.append(watch['_id'])
+                continue
+            by_term.setdefault(watch.get('term', DEFAULT_TERM), {}).update((s['CRN'], s) for s in sections)
+            active.append((watch['_id'], [s['CRN'] for s in sections]))
+            subject, body = self.email_sender.compose_confirmation_email(sections)
+            messages.append({
+                "key": f"confirm:{watch['_id']}",
+                "to": watch['email'],
+                "subject": subject,
+                "body": body
+            })
+
+        # Watches whose fetch errored keep their claim and are retried when it expires
+        for term, sections in by_term.items():
+            await self.db.upsert_sections(term, list(sections.values()), overwrite=False)
+        await self.db.enqueue_emails(messages)
+        await self.db.finish_initialization(active, failed)
+        if active and self.watch_set:
+            await self.watch_set.mark_changed()
+        if messages and self.outbox:
+            self.outbox.notify()
+        logging.info(f"Initialized {len(active)} watches, {len(failed)} failed, "
+                     f"{len(plan)} upstream queries for {len(watches)} claimed")
@@ -0,0 +1,60 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+from collections import OrderedDict
+import os
+import time
+import asyncio
+
+
+class TTLCache:
+    """LRU cache with a per-entry TTL; concurrent misses for one key share a single load"""
+
+    def __init__(self, ttl: Optional[float] = None, max_entries: Optional[int] = None):
+        self.ttl = ttl if ttl is not None else float(os.getenv("HOWDY_CACHE_TTL_SECONDS", "10"))
+        self.max_entries = max_entries or int(os.getenv("HOWDY_CACHE_MAX_ENTRIES", "1024"))
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    def get(self, key: Hashable, now: Optional[float] = None):
+        """Return a fresh cached value or None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= (now or time.monotonic()):
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        if self.ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]],
+                          cacheable: Callable[[Any], bool] = bool, refresh: bool = False) -> Any:
+        """Cached value or a shared load; `refresh` skips the cached value but still joins a load in flight"""
+        value = None if refresh else self.get(key)
+        if value is not None:
+            return value
+
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._load(key, loader, cacheable))
+            # A failed load whose callers all gave up must not log "never retrieved"
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self._inflight[key] = future
+        # Shield so one caller timing out doesn't cancel the load for everyone else
+        return await asyncio.shield(future)
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], cacheable: Callable[[Any], bool]):
+        try:
+            value = await loader()
+            if cacheable(value):
+                self.put(key, value)
+            return value
+        finally:
+            del self._inflight[key]
@@ -0,0 +1,69 @@
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import hashlib
+
+# Field order is part of the fingerprint, so only ever append to it
+FINGERPRINT_FIELDS = ("CRN", "Subject", "Course", "Section", "Title", "Instructor", "Status", "Location")
+
+SectionKey = Tuple[str, str]  # (term, CRN)
+
+
+def fingerprint(section: Dict) -> str:
+    """Stable content hash of a section, comparable across processes"""
+    content = "\x1f".join(str(section.get(field, "")) for field in FINGERPRINT_FIELDS)
+    return hashlib.blake2b(content.encode(), digest_size=8).hexdigest()
+
+
+class StoredState(NamedTuple):
+    fingerprint: Optional[str]
+    status: Optional[str]
+    version: int = 0
+
+
+class SectionChange(NamedTuple):
+    term: str
+    section: Dict
+    old_status: str
+    # Version of the section after this change; with (term, CRN) it identifies
+    # the transition, so re-detecting it after a crash yields the same key
+    version: int
+
+
+class ChangeSet:
+    """Sections that need writing, and the status transitions among them"""
+
+    def __init__(self):
+        self.upserts: List[Tuple[str, Dict, str, int]] = []  # (term, section, fingerprint, version)
+        self.transitions: List[SectionChange] = []
+
+    def __bool__(self):
+        return bool(self.upserts)
+
+    def transitions_by_term(self) -> Dict[str, List[SectionChange]]:
+        by_term = {}
+        for change in self.transitions:
+            by_term.setdefault(change.term, []).append(change)
+        return by_term
+
+
+def diff_sections(
+    current: Dict[str, Dict[str, Dict]],
+    stored: Dict[SectionKey, StoredState],
+    legacy: Optional[Dict[str, Dict[str, Dict]]] = None
+) -> ChangeSet:
+    """Compare fetched sections (term -> CRN -> section) against stored state"""
+    legacy = legacy or {}
+    change_set = ChangeSet()
+    for term, sections in current.items():
+        for crn, section in sections.items():
+            fp = fingerprint(section)
+            old = stored.get((term, crn))
+            if old is None and crn in legacy.get(term, {}):
+                old_section = legacy[term][crn]
+                old = StoredState(fingerprint(old_section), old_section['Status'])
+            if old is not None and old.fingerprint == fp:
+                continue
+            version = old.version + 1 if old is not None else 0
+            change_set.upserts.append((term, section, fp, version))
+            if old is not None and old.status and old.status != section['Status']:
+                change_set.transitions.append(SectionChange(term, section, old.status, version))
+    return change_set
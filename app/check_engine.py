@@ -0,0 +1,55 @@
+from typing import Any, Awaitable, Callable, Iterable, List, Optional
+import os
+import time
+import asyncio
+
+
+class TokenBucket:
+    """Token-bucket limiter: `rate` requests per second with bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        # Waiters queue on the lock so tokens are handed out in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def howdy_rate_limiter() -> TokenBucket:
+    """Bucket for Howdy requests, configured by HOWDY_RATE_PER_SECOND / HOWDY_BURST"""
+    return TokenBucket(
+        rate=float(os.getenv("HOWDY_RATE_PER_SECOND", "5")),
+        capacity=float(os.getenv("HOWDY_BURST", "10"))
+    )
+
+
+class CheckEngine:
+    """Runs a coroutine per item with a concurrency cap and a per-task timeout"""
+
+    def __init__(self, max_concurrency: Optional[int] = None, task_timeout: Optional[float] = None):
+        self.max_concurrency = max_concurrency or int(os.getenv("CHECK_CONCURRENCY", "8"))
+        self.task_timeout = task_timeout or float(os.getenv("CHECK_TASK_TIMEOUT", "30"))
+
+    async def map(self, func: Callable[[Any], Awaitable[Any]], items: Iterable[Any]) -> List[Any]:
+        """Return results in item order; failed or timed-out tasks yield their exception"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run_one(item):
+            async with semaphore:
+                return await asyncio.wait_for(func(item), self.task_timeout)
+
+        return await asyncio.gather(*(run_one(item) for item in items), return_exceptions=True)
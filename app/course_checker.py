@@ -1,68 +1,204 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 import asyncio
-from .database import Database
+import functools
+import logging
+import os
+from .storage import Storage
 from .email_sender import EmailSender
-from .utils import get_course_sections
+from .change_detector import diff_sections
+from .fetch_planner import execute_plan
+from .check_engine import CheckEngine
+from .howdy_client import HowdyClient
+from .live_updates import SectionBroker
+from .metrics import CHECK_QUERIES, CHECK_TRANSITIONS, CycleTrace
+from .notifications import NotificationAggregator
+from .outbox import OutboxWorker
+from .poll_policy import AdaptivePollPolicy
+from .upstream_guard import SharedHealth, UpstreamDegraded
+from .watch_set import WatchSet
+from .sendgrid_service import MAX_PERSONALIZATIONS
+from .utils import DEFAULT_TERM
 
 class CourseChecker:
-    def __init__(self, db: Database, email_sender: EmailSender):
+    def __init__(self, db: Storage, email_sender: EmailSender, howdy: HowdyClient,
+                 engine: Optional[CheckEngine] = None, outbox: Optional[OutboxWorker] = None,
+                 broker: Optional[SectionBroker] = None, health: Optional[SharedHealth] = None,
+                 watch_set: Optional[WatchSet] = None):
         self.db = db
+        self.watch_set = watch_set or WatchSet(db)
         self.email_sender = email_sender
+        self.outbox = outbox
+        self.broker = broker
+        self.health = health
+        self.howdy = howdy
+        self.engine = engine or CheckEngine()
+        self.poll_policy = AdaptivePollPolicy()
+        # "on" always sweeps the whole term, "off" never does, "auto" sweeps
+        # when the cycle would need a term-wide query anyway or many queries
+        self.snapshot_mode = os.getenv("HOWDY_SNAPSHOT_MODE", "auto").lower()
+        self.snapshot_threshold = int(os.getenv("HOWDY_SNAPSHOT_THRESHOLD", "20"))
 
     async def check_courses(self):
+        trace = CycleTrace()
+        outcome = "error"
         try:
             print("Starting course check...")
-            watches = await self.db.get_all_watches()
-            
-            for watch in watches:
-                try:
-                    current_sections = await get_course_sections(
-                        subject=watch.get('subject'),
-                        course_number=watch.get('course_number'),
-                        crns=watch['crns']
-                    )
-                    
-                    # Get previous status
-                    previous_sections = watch.get('course_info', [])
-                    
-                    # Compare status
-                    changes = []
-                    for current in current_sections:
-                        previous = next(
-                            (s for s in previous_sections if s['CRN'] == current['CRN']), 
-                            None
-                        )
-                        
-                        if previous and previous['Status'] != current['Status']:
-                            print(f"Status change detected for CRN {current['CRN']}")
-                            print(f"Previous status: {previous['Status']}")
-                            print(f"Current status: {current['Status']}")
-                            
-                            # Send email for each changed section
-                            try:
-                                await self.email_sender.send_status_change_email(
-                                    to=watch['email'],
-                                    section=current,
-                                    old_status=previous['Status'],
-                                    new_status=current['Status']
-                                )
-                                print("Email sent successfully")
-                            except Exception as e:
-                                print(f"Failed to send email: {str(e)}")
-                            
-                            changes.append(current)
-                    
-                    # If there are changes, update database
-                    if changes:
-                        await self.db.update_course_info(watch['_id'], current_sections)
-                    else:
-                        print(f"No changes detected for watch {watch['_id']}")
-                    
-                except Exception as e:
-                    print(f"Error checking courses for watch {watch['_id']}: {e}")
-                    continue
+            with trace.phase("load_watches"):
+                # Cached between ticks; only reloaded once the watches changed
+                all_queries = await self.watch_set.load()
+
+            with trace.phase("plan"):
+                # A query is due as soon as any section it covers is due
+                plan = all_queries.select(lambda key: self.poll_policy.is_due(key, all_queries.known_crns(key)))
+            if not plan:
+                outcome = "idle"
+                return
+            print(f"{len(plan)} of {len(all_queries)} queries due")
+            print(f"Fetching {len(plan)} distinct queries for {len(self.watch_set.watches)} watches")
+            CHECK_QUERIES.inc(amount=len(plan))
+            with trace.phase("fetch"):
+                if self._use_snapshot(plan):
+                    fetch = await self._snapshot_fetcher(plan)
+                else:
+                    # Due means due now, not whenever the cached copy was fetched
+                    fetch = functools.partial(self.howdy.get_course_sections, refresh=True)
+                results = await execute_plan(plan, fetch, self.engine)
+                for key, sections in results.items():
+                    self.poll_policy.observe_query(key, plan.known_crns(key), sections)
+
+            await self._process_results(plan, results, trace)
+            outcome = "ok"
                 
             print("Course check completed")
             
         except Exception as e:
-            print(f"Error in course checker: {e}")
\ No newline at end of file
+            print(f"Error in course checker: {e}")
+        finally:
+            trace.finish(outcome)
+            if self.health:
+                await self.health.publish()
+
+    def _use_snapshot(self, plan) -> bool:
+        if self.snapshot_mode == "on":
+            return True
+        if self.snapshot_mode == "off":
+            return False
+        return any(key.subject is None for key in plan.keys()) or len(plan) >= self.snapshot_threshold
+
+    async def _snapshot_fetcher(self, plan):
+        """Sweep each term once and return a get_course_sections stand-in backed by the index"""
+        snapshots = {}
+        for term in {key.term for key in plan.keys()}:
+            try:
+                snapshots[term] = await self.howdy.get_term_snapshot(term)
+                print(f"Indexed {len(snapshots[term])} sections for term {term}")
+            except Exception as e:
+                # Watches of this term are skipped rather than compared against nothing
+                print(f"Failed to sweep term {term}: {e}")
+
+        async def lookup(subject: Optional[str] = None, course_number: Optional[str] = None,
+                         crns: Optional[List[str]] = None, term: str = DEFAULT_TERM) -> List[Dict]:
+            if term not in snapshots:
+                raise UpstreamDegraded(f"No snapshot of term {term}")
+            return snapshots[term].lookup(subject, course_number, crns)
+
+        return lookup
+
+    async def _process_results(self, plan, results, trace: CycleTrace):
+        """Store the fetched sections and notify the watchers of any that changed"""
+        # Keep each watch's CRN references in step with what its query returns
+        links = []
+        # Watches from before the sections collection aren't linked until the
+        # persist phase, so get_watchers can't find them yet
+        unlinked = []
+        for watch, sections in plan.fan_out(results):
+            crns = [s['CRN'] for s in sections]
+            if watch.get('section_crns') != crns:
+                links.append((watch['_id'], crns))
+            if 'section_crns' not in watch:
+                unlinked.append((watch, crns))
+
+        current = {}
+        legacy = {}
+        for key, sections in results.items():
+            current.setdefault(key.term, {}).update((s['CRN'], s) for s in sections)
+            for watch in plan.watches[key]:
+                if 'section_crns' not in watch:
+                    # Watches from before the sections collection carry their own copy
+                    legacy.setdefault(key.term, {}).update(
+                        (s['CRN'], s) for s in watch.get('course_info') or ()
+                    )
+
+        with trace.phase("diff"):
+            stored = await self.db.get_section_states(
+                [(term, crn) for term, sections in current.items() for crn in sections]
+            )
+            change_set = diff_sections(current, stored, legacy)
+        CHECK_TRANSITIONS.inc(amount=len(change_set.transitions))
+
+        # Queue notifications before persisting: if the cycle dies in between,
+        # the next one re-detects the same transitions and the outbox dedupes them
+        if not change_set.transitions:
+            print("No status changes detected")
+        for change in change_set.transitions:
+            print(f"Status change detected for CRN {change.section['CRN']}: "
+                  f"{change.old_status} -> {change.section['Status']}")
+        if change_set.transitions:
+            with trace.phase("notify"):
+                await self._notify(change_set, unlinked)
+
+        with trace.phase("persist"):
+            if change_set.transitions:
+                # Like notifications, history goes first; the version dedupes a repeat
+                try:
+                    await self.db.record_transitions(change_set.transitions)
+                except Exception as e:
+                    logging.error(f"Failed to record section history: {str(e)}")
+            await self.db.apply_change_set(change_set)
+            await self.db.link_watches(links)
+            if links:
+                await self.watch_set.mark_changed()
+
+        # Only once stored, so a live client never sees state a restart would undo
+        if self.broker:
+            for term, section, _, version in change_set.upserts:
+                self.broker.publish(term, section, version)
+
+    async def _notify(self, change_set, unlinked=()):
+        """Queue one digest email per recipient covering every change they watch
+
+        `unlinked` holds (watch, crns) for watches this cycle fetched for but
+        hasn't linked to their sections yet.
+        """
+        aggregator = NotificationAggregator()
+        for term, changes in change_set.transitions_by_term().items():
+            by_crn = {change.section['CRN']: change for change in changes}
+            watchers = [
+                (watch, watch.get('section_crns', []))
+                for watch in await self.db.get_watchers(term, list(by_crn))
+            ]
+            watchers += [(watch, crns) for watch, crns in unlinked if (watch.get('term') or DEFAULT_TERM) == term]
+            for watch, crns in watchers:
+                for crn in crns:
+                    if crn in by_crn:
+                        aggregator.add(watch['email'], by_crn[crn])
+
+        messages = []
+        for digest in aggregator.digests():
+            # Rendered once per distinct set of changes, however many students share it
+            subject, body = self.email_sender.compose_digest_email(
+                [(c.section, c.old_status, c.section['Status']) for c in digest.changes]
+            )
+            for i in range(0, len(digest.recipients), MAX_PERSONALIZATIONS):
+                messages.append({
+                    "key": f"{digest.key}:{i // MAX_PERSONALIZATIONS}",
+                    "recipients": digest.recipients[i:i + MAX_PERSONALIZATIONS],
+                    "subject": subject,
+                    "body": body
+                })
+
+        queued = await self.db.enqueue_emails(messages)
+        print(f"Queued {queued} emails for {len(aggregator)} recipients of "
+              f"{len(change_set.transitions)} status changes")
+        if self.outbox:
+            self.outbox.notify()
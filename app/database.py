@@ -3,12 +3,18 @@ import certifi
 import logging
 from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv, find_dotenv
-from datetime import datetime
+from datetime import datetime, timedelta
 from bson.objectid import ObjectId
-from pymongo.errors import ServerSelectionTimeoutError
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, CollectionInvalid, DuplicateKeyError, ServerSelectionTimeoutError
 import backoff
+from .utils import DEFAULT_TERM, section_to_dict
+from .change_detector import StoredState, fingerprint
+from .storage import Storage, new_watch_document
+
+class Database(Storage):
+    """MongoDB backend"""
 
-class Database:
     def __init__(self):
         try:
             load_dotenv(find_dotenv())
@@ -43,6 +49,12 @@ class Database:
             logging.error(f"Failed to connect to MongoDB: {str(e)}")
             raise
 
+    async def ping(self):
+        await self.client.admin.command('ping')
+
+    async def close(self):
+        self.client.close()
+
     @backoff.on_exception(
         backoff.expo,
         ServerSelectionTimeoutError,
@@ -51,23 +63,47 @@ class Database:
     async def get_all_watches(self):
         try:
             cursor = self.db.watches.find({})
-            return await cursor.to_list(length=None)
+            return await self._attach_course_info(await cursor.to_list(length=None))
         except Exception as e:
             logging.error(f"Failed to get watches: {str(e)}")
             return []
 
+    async def list_watches(self, email=None, status=None, crn=None, after=None, limit=50, fields=None):
+        """Get one page of watches in _id order. Returns (watches, cursor of the next page or None)"""
+        query = {}
+        if email:
+            query["email"] = email
+        if status:
+            query["status"] = status
+        if crn:
+            query["crns"] = crn
+        if after:
+            query["_id"] = {"$gt": ObjectId(after)}
+
+        projection = None
+        if fields:
+            projection = dict.fromkeys(fields, 1)
+            if "course_info" in projection:
+                # course_info is rebuilt from the sections collection (only
+                # older watches store their own), so fetch what the join needs
+                projection.update(term=1, section_crns=1)
+
+        cursor = self.db.watches.find(query, projection).sort("_id", 1).limit(limit + 1)
+        watches = await cursor.to_list(length=None)
+        next_cursor = str(watches[limit - 1]["_id"]) if len(watches) > limit else None
+        watches = watches[:limit]
+        if not fields or "course_info" in fields:
+            await self._attach_course_info(watches)
+        if fields:
+            # Drop the join's fields unless they were asked for
+            keep = set(fields) | {"_id"}
+            watches = [{k: v for k, v in watch.items() if k in keep} for watch in watches]
+        return watches, next_cursor
+
     async def add_watch_minimal(self, subject, course_number, crns, email):
         """Add a new watch with minimal information"""
         try:
-            document = {
-                "subject": subject,
-                "course_number": course_number,
-                "crns": crns,
-                "email": email,
-                "status": "initializing",
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow()
-            }
+            document = new_watch_document(subject, course_number, crns, email, datetime.utcnow())
             
             result = await self.db.watches.insert_one(document)
             return result.inserted_id
@@ -76,6 +112,24 @@ class Database:
             logging.error(f"Failed to add watch: {str(e)}")
             raise
 
+    async def add_watches_bulk(self, watches):
+        """Add many watches with minimal information in one insert_many; returns their ids"""
+        try:
+            now = datetime.utcnow()
+            documents = [
+                new_watch_document(watch.subject, watch.course_number, watch.crns or [], watch.email, now)
+                for watch in watches
+            ]
+            if not documents:
+                return []
+
+            result = await self.db.watches.insert_many(documents, ordered=False)
+            return result.inserted_ids
+
+        except Exception as e:
+            logging.error(f"Failed to add watches: {str(e)}")
+            raise
+
     async def update_watch_status(self, watch_id, status):
         """Update the status of a watch"""
         try:
@@ -103,33 +157,206 @@ class Database:
             if isinstance(watch_id, str):
                 watch_id = ObjectId(watch_id)
                 
-            return await self.db.watches.find_one({"_id": watch_id})
+            watch = await self.db.watches.find_one({"_id": watch_id})
+            if watch:
+                await self._attach_course_info([watch])
+            return watch
             
         except Exception as e:
             logging.error(f"Failed to get watch: {str(e)}")
             return None
 
-    async def update_course_info(self, watch_id, sections):
-        """Update the course information for a watch"""
+    async def link_watch_sections(self, watch_id, crns):
+        """Set the CRNs a watch references, dropping any embedded course_info copy"""
         try:
             if isinstance(watch_id, str):
                 watch_id = ObjectId(watch_id)
-                
+
             result = await self.db.watches.update_one(
                 {"_id": watch_id},
                 {
                     "$set": {
-                        "course_info": sections,
+                        "section_crns": crns,
                         "updated_at": datetime.utcnow()
-                    }
+                    },
+                    "$unset": {"course_info": ""}
                 }
             )
             return result.modified_count > 0
-            
+
         except Exception as e:
-            logging.error(f"Failed to update course info: {str(e)}")
+            logging.error(f"Failed to link watch sections: {str(e)}")
             return False
 
+    async def link_watches(self, links):
+        """Bulk version of link_watch_sections for (watch_id, crns) pairs"""
+        if not links:
+            return
+        now = datetime.utcnow()
+        await self.db.watches.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": watch_id},
+                    {"$set": {"section_crns": crns, "updated_at": now}, "$unset": {"course_info": ""}}
+                )
+                for watch_id, crns in links
+            ],
+            ordered=False
+        )
+
+    @staticmethod
+    def _section_id(term, crn):
+        return f"{term}:{crn}"
+
+    def _section_upsert(self, term, section, section_fingerprint, now, overwrite=True, version=0):
+        fields = {
+            "term": term,
+            "crn": section['CRN'],
+            "section": section_to_dict(section),
+            "fingerprint": section_fingerprint,
+            "version": version,
+            "updated_at": now
+        }
+        return UpdateOne(
+            {"_id": self._section_id(term, section['CRN'])},
+            {"$set": fields, "$setOnInsert": {"created_at": now}} if overwrite
+            else {"$setOnInsert": {**fields, "created_at": now}},
+            upsert=True
+        )
+
+    async def upsert_sections(self, term, sections, overwrite=True):
+        """Write the current state of sections, one document per (term, CRN)
+
+        With overwrite=False only sections that aren't stored yet are written, so
+        lookups outside the check cycle can't hide a transition from it.
+        """
+        if not sections:
+            return
+        now = datetime.utcnow()
+        await self.db.sections.bulk_write(
+            [self._section_upsert(term, s, fingerprint(s), now, overwrite) for s in sections],
+            ordered=False
+        )
+
+    async def apply_change_set(self, change_set):
+        """Persist every changed section of a cycle in one unordered bulk_write"""
+        if not change_set.upserts:
+            return
+        now = datetime.utcnow()
+        await self.db.sections.bulk_write(
+            [
+                self._section_upsert(term, section, fp, now, version=version)
+                for term, section, fp, version in change_set.upserts
+            ],
+            ordered=False
+        )
+
+    async def get_section_states(self, keys):
+        """Get the stored fingerprint and status for (term, CRN) pairs, in one query"""
+        try:
+            cursor = self.db.sections.find(
+                {"_id": {"$in": [self._section_id(term, crn) for term, crn in keys]}},
+                {"term": 1, "crn": 1, "fingerprint": 1, "version": 1, "section.Status": 1}
+            )
+            return {
+                (doc["term"], doc["crn"]): StoredState(
+                    doc.get("fingerprint"), doc["section"].get("Status"), doc.get("version", 0)
+                )
+                for doc in await cursor.to_list(length=None)
+            }
+
+        except Exception as e:
+            logging.error(f"Failed to get section states: {str(e)}")
+            raise
+
+    async def record_transitions(self, transitions):
+        """Append transitions to the section_history time-series collection in one insert"""
+        if not transitions:
+            return
+        now = datetime.utcnow()
+        await self.db.section_history.insert_many(
+            [
+                {
+                    "at": now,
+                    "section": {"term": change.term, "crn": change.section['CRN']},
+                    "from": change.old_status,
+                    "to": change.section['Status'],
+                    "version": change.version
+                }
+                for change in transitions
+            ],
+            ordered=False
+        )
+
+    async def get_section_history(self, term, crn, since=None, until=None):
+        """Get one section's transitions over the (section.term, section.crn, at) index"""
+        query = {"section.term": term, "section.crn": crn}
+        if since or until:
+            query["at"] = {}
+            if since:
+                query["at"]["$gte"] = since
+            if until:
+                query["at"]["$lt"] = until
+        cursor = self.db.section_history.find(query, {"_id": 0, "section": 0}).sort("at", 1)
+
+        events = []
+        seen = set()
+        for doc in await cursor.to_list(length=None):
+            if doc["version"] not in seen:
+                seen.add(doc["version"])
+                events.append(doc)
+        return events
+
+    async def get_section_record(self, term, crn):
+        """Get one stored section with its version and created_at/updated_at, or None"""
+        return await self.db.sections.find_one(
+            {"_id": self._section_id(term, crn)},
+            {"_id": 0, "fingerprint": 0}
+        )
+
+    async def get_sections_updated_since(self, since):
+        """Get sections written after `since`, over the updated_at index"""
+        cursor = self.db.sections.find(
+            {"updated_at": {"$gt": since}},
+            {"_id": 0, "term": 1, "crn": 1, "section": 1, "version": 1, "updated_at": 1}
+        )
+        return [
+            {**doc, "version": doc.get("version", 0)}
+            for doc in await cursor.to_list(length=None)
+        ]
+
+    async def get_watchers(self, term, crns):
+        """Get the watches referencing any of the CRNs, via the (term, section_crns) index"""
+        try:
+            cursor = self.db.watches.find({"term": term, "section_crns": {"$in": list(crns)}})
+            return await cursor.to_list(length=None)
+
+        except Exception as e:
+            logging.error(f"Failed to get watchers: {str(e)}")
+            raise
+
+    async def _attach_course_info(self, watches):
+        """Fill in course_info for watches that reference CRNs, with one sections query"""
+        ids = {
+            self._section_id(watch.get('term', DEFAULT_TERM), crn)
+            for watch in watches
+            for crn in watch.get('section_crns', ())
+        }
+        if not ids:
+            return watches
+
+        cursor = self.db.sections.find({"_id": {"$in": list(ids)}})
+        sections = {doc["_id"]: doc["section"] for doc in await cursor.to_list(length=None)}
+        for watch in watches:
+            if 'section_crns' in watch:
+                term = watch.get('term', DEFAULT_TERM)
+                watch['course_info'] = [
+                    sections[key]
+                    for key in (self._section_id(term, crn) for crn in watch['section_crns'])
+                    if key in sections
+                ]
+        return watches
+
     async def delete_watch(self, watch_id):
         """Delete a watch by its ID"""
         try:
@@ -142,3 +369,219 @@ class Database:
         except Exception as e:
             logging.error(f"Failed to delete watch: {str(e)}")
             return False
+
+    async def ensure_indexes(self):
+        """Create the indexes the app relies on and backfill fields older watches lack
+
+        Every step is attempted even if an earlier one fails, then the first
+        failure is raised so the caller can retry before relying on them.
+        """
+        # Time-series: documents are bucketed per section and compressed by the server
+        steps = [
+            self._ensure_history_collection,
+            lambda: self.db.watches.update_many({"term": {"$exists": False}}, {"$set": {"term": DEFAULT_TERM}}),
+            # A section stored before created_at has been tracked at least since its last write
+            lambda: self.db.sections.update_many(
+                {"created_at": {"$exists": False}},
+                [{"$set": {"created_at": "$updated_at"}}]
+            ),
+            # Multikey index: the CRN -> watchers inverted index
+            lambda: self.db.watches.create_index([("term", 1), ("section_crns", 1)]),
+            # Keyset pagination filters on these and walks _id
+            lambda: self.db.watches.create_index([("email", 1), ("_id", 1)]),
+            lambda: self.db.watches.create_index([("status", 1), ("_id", 1)]),
+            lambda: self.db.watches.create_index([("crns", 1), ("_id", 1)]),
+            lambda: self.db.watches.create_index([("updated_at", -1)]),
+            # Live updates on workers other than the leader poll for recent writes
+            lambda: self.db.sections.create_index("updated_at"),
+            lambda: self.db.outbox.create_index("key", unique=True),
+            lambda: self.db.outbox.create_index([("status", 1), ("next_attempt_at", 1)]),
+            # Delivered emails only need to stick around long enough to dedupe retries
+            lambda: self.db.outbox.create_index("sent_at", expireAfterSeconds=7 * 24 * 3600),
+            lambda: self.db.section_history.create_index([("section.term", 1), ("section.crn", 1), ("at", 1)]),
+        ]
+        failure = None
+        for step in steps:
+            try:
+                await step()
+            except Exception as e:
+                logging.error(f"Failed to ensure indexes: {str(e)}")
+                failure = failure or e
+        if failure:
+            raise failure
+
+    async def _ensure_history_collection(self):
+        try:
+            await self.db.create_collection(
+                "section_history",
+                timeseries={"timeField": "at", "metaField": "section", "granularity": "minutes"}
+            )
+        except CollectionInvalid:
+            # Already there; a plain one means something wrote history before this ran
+            if "timeseries" not in await self.db.section_history.options():
+                logging.error("section_history exists but is not a time-series collection")
+
+    async def acquire_lease(self, name, owner, ttl_seconds):
+        """Take or renew a named lease. Returns True if `owner` holds it afterwards"""
+        try:
+            now = datetime.utcnow()
+            lease = await self.db.leases.find_one_and_update(
+                {"_id": name, "$or": [{"owner": owner}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=ttl_seconds)}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            return lease is not None and lease["owner"] == owner
+
+        except DuplicateKeyError:
+            # The upsert raced with a live lease held by someone else
+            return False
+        except Exception as e:
+            logging.error(f"Failed to acquire lease {name}: {str(e)}")
+            return False
+
+    async def release_lease(self, name, owner):
+        """Give up a lease so another worker can take over without waiting for expiry"""
+        try:
+            result = await self.db.leases.delete_one({"_id": name, "owner": owner})
+            return result.deleted_count > 0
+
+        except Exception as e:
+            logging.error(f"Failed to release lease {name}: {str(e)}")
+            return False
+
+    async def put_status(self, name, fields):
+        await self.db.status.update_one(
+            {"_id": name},
+            {"$set": {**fields, "updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+
+    async def get_status(self, name):
+        return await self.db.status.find_one({"_id": name}, {"_id": 0})
+
+    async def enqueue_emails(self, messages):
+        """Add emails to the outbox. Messages whose idempotency key is already there are skipped"""
+        if not messages:
+            return 0
+        now = datetime.utcnow()
+        documents = [
+            {
+                **message,
+                "status": "pending",
+                "attempts": 0,
+                "next_attempt_at": now,
+                "created_at": now
+            }
+            for message in messages
+        ]
+        try:
+            result = await self.db.outbox.insert_many(documents, ordered=False)
+            return len(result.inserted_ids)
+
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != 11000 for error in errors):
+                raise
+            return e.details.get("nInserted", 0)
+
+    async def claim_email(self, owner, lease_seconds):
+        """Claim the next due outbox email, including ones a dead worker left mid-send"""
+        now = datetime.utcnow()
+        return await self.db.outbox.find_one_and_update(
+            {
+                "$or": [
+                    {"status": "pending", "next_attempt_at": {"$lte": now}},
+                    {"status": "sending", "claimed_until": {"$lt": now}}
+                ]
+            },
+            {"$set": {
+                "status": "sending",
+                "claimed_by": owner,
+                "claimed_until": now + timedelta(seconds=lease_seconds)
+            }},
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def mark_email_sent(self, email_id):
+        await self.db.outbox.update_one(
+            {"_id": email_id},
+            {"$set": {"status": "sent", "sent_at": datetime.utcnow()}}
+        )
+
+    async def retry_email(self, email_id, attempts, next_attempt_at, error):
+        await self.db.outbox.update_one(
+            {"_id": email_id},
+            {"$set": {
+                "status": "pending",
+                "attempts": attempts,
+                "next_attempt_at": next_attempt_at,
+                "last_error": error
+            }}
+        )
+
+    async def dead_letter_email(self, email_id, attempts, error):
+        """Park an email that kept failing so it stops being retried"""
+        await self.db.outbox.update_one(
+            {"_id": email_id},
+            {"$set": {
+                "status": "dead",
+                "attempts": attempts,
+                "last_error": error,
+                "dead_at": datetime.utcnow()
+            }}
+        )
+
+    async def claim_initializing_watches(self, owner, limit, claim_seconds):
+        """Claim up to `limit` watches still initializing, including ones orphaned by a restart"""
+        now = datetime.utcnow()
+        claimable = {
+            "status": "initializing",
+            "$or": [
+                {"init_claimed_until": {"$exists": False}},
+                {"init_claimed_until": {"$lt": now}}
+            ]
+        }
+        cursor = self.db.watches.find(claimable, {"_id": 1}).sort("_id", 1).limit(limit)
+        ids = [doc["_id"] for doc in await cursor.to_list(length=None)]
+        if not ids:
+            return []
+
+        # Re-checking claimability in the update means only one worker wins each watch
+        await self.db.watches.update_many(
+            {**claimable, "_id": {"$in": ids}},
+            {"$set": {"init_claimed_by": owner, "init_claimed_until": now + timedelta(seconds=claim_seconds)}}
+        )
+        cursor = self.db.watches.find({"_id": {"$in": ids}, "status": "initializing", "init_claimed_by": owner})
+        return await cursor.to_list(length=None)
+
+    async def finish_initialization(self, active, failed):
+        """Mark initialized watches active with their CRNs, in one bulk_write
+
+        `active` is a list of (watch_id, crns) pairs, `failed` a list of watch ids.
+        """
+        now = datetime.utcnow()
+        done = {"init_claimed_by": "", "init_claimed_until": "", "course_info": ""}
+        operations = [
+            UpdateOne(
+                {"_id": watch_id},
+                {"$set": {"status": "active", "section_crns": crns, "updated_at": now}, "$unset": done}
+            )
+            for watch_id, crns in active
+        ] + [
+            UpdateOne(
+                {"_id": watch_id},
+                {"$set": {"status": "failed", "updated_at": now}, "$unset": done}
+            )
+            for watch_id in failed
+        ]
+        if operations:
+            await self.db.watches.bulk_write(operations, ordered=False)
+
+    async def queue_depths(self):
+        """Count pending outbox emails and initializing watches; both counts are index-only"""
+        return {
+            "outbox": await self.db.outbox.count_documents({"status": "pending"}),
+            "initializing": await self.db.watches.count_documents({"status": "initializing"})
+        }
@@ -5,10 +5,13 @@ class EmailSender:
     def __init__(self, email_service=None):
         self.email_service = email_service
 
+    def compose_confirmation_email(self, sections):
+        """Return the (subject, body) of a watch confirmation email"""
+        return "Course Watch Confirmation", self._create_confirmation_email_body(sections)
+
     async def send_confirmation_email(self, to, sections):
         try:
-            subject = "Course Watch Confirmation"
-            body = self._create_confirmation_email_body(sections)
+            subject, body = self.compose_confirmation_email(sections)
             
             logging.info(f"Attempting to send confirmation email to {to}")
             logging.info(f"Email subject: {subject}")
@@ -45,10 +48,30 @@ class EmailSender:
         body += "You will receive notifications when the status of any section changes."
         return body
 
+    def compose_status_change_email(self, section, old_status, new_status):
+        """Return the (subject, body) of a status change email"""
+        subject = f"Course Status Change: {section['Subject']} {section['Course']}-{section['Section']}"
+        return subject, self._create_status_change_email_body(section, old_status, new_status)
+
+    def compose_digest_email(self, changes):
+        """Return the (subject, body) for a list of (section, old_status, new_status) changes"""
+        if len(changes) == 1:
+            return self.compose_status_change_email(*changes[0])
+
+        subject = f"Course Status Changes: {len(changes)} sections"
+        body = "The status of the following sections has changed:\n\n"
+        for section, old_status, new_status in changes:
+            body += f"CRN: {section['CRN']}\n"
+            body += f"Course: {section['Subject']} {section['Course']}-{section['Section']}\n"
+            body += f"Title: {section['Title']}\n"
+            body += f"Instructor: {section['Instructor']}\n"
+            body += f"Status: {old_status} -> {new_status}\n"
+            body += f"Location: {section['Location']}\n\n"
+        return subject, body
+
     async def send_status_change_email(self, to, section, old_status, new_status):
         try:
-            subject = f"Course Status Change: {section['Subject']} {section['Course']}-{section['Section']}"
-            body = self._create_status_change_email_body(section, old_status, new_status)
+            subject, body = self.compose_status_change_email(section, old_status, new_status)
             
             success = await self.email_service.send_email(
                 to=to,
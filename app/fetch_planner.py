@@ -0,0 +1,128 @@
+from typing import Awaitable, Callable, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+import logging
+from .check_engine import CheckEngine
+from .upstream_guard import UpstreamDegraded
+from .utils import DEFAULT_TERM
+
+
+class FetchKey(NamedTuple):
+    """One distinct upstream query. Subject and course number are None for CRN lookups."""
+    term: str
+    subject: Optional[str] = None
+    course_number: Optional[str] = None
+
+
+def fetch_key_for(watch: Dict) -> Optional[FetchKey]:
+    """Return the upstream query a watch needs, or None if it can't be looked up"""
+    term = watch.get('term') or DEFAULT_TERM
+    subject = watch.get('subject')
+    course_number = watch.get('course_number')
+
+    if subject and course_number:
+        return FetchKey(term, subject, str(course_number))
+    if watch.get('crns'):
+        # Howdy ignores the CRNs in a subject-less query, so every CRN-only
+        # watch of a term can share the same request.
+        return FetchKey(term)
+    return None
+
+
+def sections_for_watch(watch: Dict, sections: List[Dict]) -> List[Dict]:
+    """Narrow the sections of a shared query down to the ones a watch asked for"""
+    crns = watch.get('crns')
+    if not crns:
+        return sections
+    crn_set = set(crns)
+    return [s for s in sections if s['CRN'] in crn_set]
+
+
+class FetchPlan:
+    """Groups watches by the upstream query they need so each query runs once per cycle"""
+
+    def __init__(self):
+        self.watches: Dict[FetchKey, List[Dict]] = {}
+        self.crns: Dict[FetchKey, Set[str]] = {}
+        self.skipped: List[Dict] = []
+
+    def add(self, watch: Dict):
+        key = fetch_key_for(watch)
+        if key is None:
+            self.skipped.append(watch)
+            return
+        self.watches.setdefault(key, []).append(watch)
+        if key.subject is None:
+            self.crns.setdefault(key, set()).update(watch['crns'])
+
+    def __len__(self):
+        return len(self.watches)
+
+    def keys(self) -> List[FetchKey]:
+        return list(self.watches)
+
+    def known_crns(self, key: FetchKey) -> Set[str]:
+        """CRNs a query is expected to return, from watch filters and stored course info"""
+        crns = set(self.crns.get(key, ()))
+        for watch in self.watches[key]:
+            crns.update(watch.get('crns') or ())
+            crns.update(s['CRN'] for s in watch.get('course_info') or ())
+        return crns
+
+    def select(self, keep: Callable[[FetchKey], bool]) -> "FetchPlan":
+        """A plan of only the queries for which `keep` returns True, leaving this one intact"""
+        plan = FetchPlan()
+        for key, watches in self.watches.items():
+            if keep(key):
+                plan.watches[key] = watches
+                if key in self.crns:
+                    plan.crns[key] = self.crns[key]
+        return plan
+
+    def query_crns(self, key: FetchKey) -> Optional[List[str]]:
+        """CRN filter to send with a query, None for course queries"""
+        crns = self.crns.get(key)
+        return sorted(crns) if crns else None
+
+    def fan_out(self, results: Dict[FetchKey, List[Dict]]) -> Iterator[Tuple[Dict, List[Dict]]]:
+        """Yield (watch, sections) for every watch whose query produced a result"""
+        for key, sections in results.items():
+            for watch in self.watches.get(key, []):
+                yield watch, sections_for_watch(watch, sections)
+
+
+def plan_fetches(watches: List[Dict]) -> FetchPlan:
+    plan = FetchPlan()
+    for watch in watches:
+        plan.add(watch)
+    return plan
+
+
+async def execute_plan(
+    plan: FetchPlan,
+    get_course_sections: Callable[..., Awaitable[List[Dict]]],
+    engine: CheckEngine
+) -> Dict[FetchKey, List[Dict]]:
+    """Run one upstream query per distinct key, concurrently within the engine's limits"""
+    keys = plan.keys()
+
+    async def fetch(key: FetchKey) -> List[Dict]:
+        return await get_course_sections(
+            subject=key.subject,
+            course_number=key.course_number,
+            crns=plan.query_crns(key),
+            term=key.term
+        )
+
+    results = {}
+    degraded = 0
+    for key, sections in zip(keys, await engine.map(fetch, keys)):
+        if isinstance(sections, UpstreamDegraded):
+            degraded += 1
+            continue
+        if isinstance(sections, BaseException):
+            logging.error(f"Error fetching sections for {key}: {sections!r}")
+            continue
+        results[key] = sections
+    if degraded:
+        # Missing keys leave their watches and stored sections untouched
+        logging.warning(f"Howdy degraded: {degraded} of {len(keys)} queries keep their last known state")
+    return results
@@ -0,0 +1,187 @@
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+import os
+import asyncio
+import logging
+import time
+import aiohttp
+from .cache import TTLCache
+from .check_engine import TokenBucket, howdy_rate_limiter
+from .json_stream import iter_json_array
+from .metrics import HOWDY_LOOKUP_SECONDS, HOWDY_REQUEST_SECONDS, HOWDY_ROWS, timed
+from .upstream_guard import UpstreamDegraded, UpstreamGuard, howdy_guard
+from .utils import DEFAULT_TERM, Section, SectionIndex, format_course
+
+HOWDY_URL = os.getenv("HOWDY_URL", "https://howdy.tamu.edu/api/course-sections")
+HOWDY_HEADERS = {
+    "User-Agent": "Mozilla/5.0",
+    "Accept": "application/json",
+    "Content-Type": "application/json"
+}
+PAGE_SIZE = int(os.getenv("HOWDY_PAGE_SIZE", "500"))
+SNAPSHOT_CONCURRENCY = int(os.getenv("HOWDY_SNAPSHOT_CONCURRENCY", "4"))
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class HowdyClient:
+    """Long-lived client for the Howdy course-sections API sharing one pooled session"""
+
+    def __init__(self, url: str = HOWDY_URL, rate_limiter: Optional[TokenBucket] = None, cache: Optional[TTLCache] = None,
+                 guard: Optional[UpstreamGuard] = None):
+        self.url = url
+        self.rate_limiter = rate_limiter or howdy_rate_limiter()
+        self.cache = cache or TTLCache()
+        self.guard = guard or howdy_guard()
+        # Parse responses incrementally instead of buffering the whole body
+        self.streaming = os.getenv("HOWDY_STREAMING", "true").lower() == "true"
+        self.limit_per_host = int(os.getenv("HOWDY_CONNECTIONS_PER_HOST", "8"))
+        self.keepalive_timeout = float(os.getenv("HOWDY_KEEPALIVE_SECONDS", "30"))
+        self.dns_cache_ttl = int(os.getenv("HOWDY_DNS_CACHE_SECONDS", "300"))
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self):
+        """Open the pooled session. Must run inside the serving event loop."""
+        if self.session and not self.session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.dns_cache_ttl,
+            use_dns_cache=True
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            headers=HOWDY_HEADERS,
+            timeout=aiohttp.ClientTimeout(total=5)  # Reduced timeout
+        )
+        logging.info("Howdy client session opened")
+
+    async def close(self):
+        if self.session:
+            await self.session.close()
+            self.session = None
+            logging.info("Howdy client session closed")
+
+    async def _session(self) -> aiohttp.ClientSession:
+        if not self.session or self.session.closed:
+            await self.start()
+        return self.session
+
+    async def _iter_rows(self, response: aiohttp.ClientResponse) -> AsyncIterator[Dict]:
+        if self.streaming:
+            async for row in iter_json_array(response.content.iter_chunked(STREAM_CHUNK_SIZE)):
+                yield row
+        else:
+            for row in await response.json():
+                yield row
+
+    async def fetch_page(self, term: str, start_row: int, filters: Dict,
+                         keep: Callable[[Dict], Any]) -> Tuple[List[Tuple[str, Any]], int]:
+        """Fetch one page, applying `keep` to each row as it is parsed
+
+        `keep` returns the value to retain for a row, or None to drop it. Returns
+        the retained (CRN, value) pairs and the number of rows on the page.
+        Raises UpstreamDegraded if the request fails or the circuit is open.
+        """
+        session = await self._session()
+        kept = []
+        count = 0
+        async with self.guard.call(self.rate_limiter):
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                async with session.post(
+                    self.url,
+                    json={
+                        "startRow": start_row,
+                        "endRow": start_row + PAGE_SIZE,
+                        "termCode": term,
+                        "publicSearch": "Y",
+                        **filters
+                    }
+                ) as response:
+                    response.raise_for_status()
+                    async for row in self._iter_rows(response):
+                        count += 1
+                        value = keep(row)
+                        if value is not None:
+                            kept.append((row.get("SWV_CLASS_SEARCH_CRN"), value))
+                outcome = "ok"
+            finally:
+                HOWDY_REQUEST_SECONDS.observe(time.perf_counter() - start, outcome)
+                HOWDY_ROWS.inc(amount=count)
+        return kept, count
+
+    async def fetch_all_rows(self, term: str, filters: Dict, concurrency: int = 1,
+                             keep: Optional[Callable[[Dict], Any]] = None) -> List[Any]:
+        """Page through every row of a query, `concurrency` pages at a time"""
+        keep = keep or (lambda row: row)
+        rows = []
+        seen_crns = set()
+        start_row = 0
+        while True:
+            starts = [start_row + i * PAGE_SIZE for i in range(concurrency)]
+            pages = await asyncio.gather(*(self.fetch_page(term, s, filters, keep) for s in starts))
+            for kept, _ in pages:
+                for crn, value in kept:
+                    # Guard against overlapping pages if endRow turns out to be inclusive
+                    if crn in seen_crns:
+                        continue
+                    seen_crns.add(crn)
+                    rows.append(value)
+            if any(count < PAGE_SIZE for _, count in pages):
+                return rows
+            start_row = starts[-1] + PAGE_SIZE
+
+    @timed(HOWDY_LOOKUP_SECONDS)
+    async def get_course_sections(self, subject: Optional[str] = None, course_number: Optional[str] = None, crns: Optional[List[str]] = None, term: str = DEFAULT_TERM, refresh: bool = False) -> List[Section]:
+        """Cached, single-flight lookup; the page, initialization and the checker share results
+
+        An empty list means Howdy has no matching sections. Upstream failures
+        raise UpstreamDegraded so callers keep their last known state instead.
+        `refresh` ignores cached results (the checker's poll interval can be
+        shorter than the TTL) and caches the fresh one for everyone else.
+        """
+        key = (term, subject, str(course_number) if course_number else None, tuple(sorted(crns)) if crns else None)
+        # Empty results are usually swallowed errors, so they are never cached
+        return await self.cache.get_or_load(
+            key,
+            lambda: self._fetch_course_sections(subject, course_number, crns, term),
+            refresh=refresh
+        )
+
+    async def _fetch_course_sections(self, subject: Optional[str], course_number: Optional[str], crns: Optional[List[str]], term: str) -> List[Section]:
+        try:
+            # Filter (and format) rows as they are parsed so unwanted ones are never kept
+            if crns:
+                crn_set = set(crns)  # Convert to set for O(1) lookup
+                keep = lambda row: format_course(row) if row["SWV_CLASS_SEARCH_CRN"] in crn_set else None
+            elif subject and course_number:
+                keep = lambda row: (
+                    format_course(row)
+                    if row["SWV_CLASS_SEARCH_SUBJECT"] == subject and row["SWV_CLASS_SEARCH_COURSE"] == str(course_number)
+                    else None
+                )
+            else:
+                return []
+
+            if subject and course_number:
+                filters = {"subject": subject, "courseNumber": str(course_number)}
+                concurrency = 1
+            else:
+                # A CRN-only query has no upstream filter, so it has to sweep the whole term
+                filters = {}
+                concurrency = SNAPSHOT_CONCURRENCY
+
+            return await self.fetch_all_rows(term, filters, concurrency, keep)
+
+        except UpstreamDegraded:
+            raise
+        except Exception as e:
+            print(f"Error fetching course sections: {e}")
+            raise UpstreamDegraded(f"Howdy lookup failed: {e!r}") from e
+
+    async def get_term_snapshot(self, term: str = DEFAULT_TERM) -> SectionIndex:
+        """Sweep every section of a term and index it. Raises UpstreamDegraded on upstream failure."""
+        # Rows become compact Section records as soon as they are parsed
+        sections = await self.fetch_all_rows(term, {}, SNAPSHOT_CONCURRENCY, format_course)
+        return SectionIndex(term, sections)
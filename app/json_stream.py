@@ -0,0 +1,60 @@
+from typing import Any, AsyncIterator
+import json
+import codecs
+
+_WHITESPACE = " \t\r\n"
+
+
+async def iter_json_array(chunks: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    """Yield the elements of a top-level JSON array as they arrive, one chunk at a time
+
+    Only the current partial element is ever buffered, so memory stays flat
+    however long the array is.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    started = False
+    finished = False
+
+    async for chunk in chunks:
+        buffer += utf8.decode(chunk)
+        pos = 0
+        while not finished:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos == len(buffer):
+                break
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError("Expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == ",":
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                finished = True
+                pos += 1
+                break
+            try:
+                element, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break  # Element continues in the next chunk
+            if not isinstance(element, (dict, list)):
+                # "1" of "1.5" or "1e3" decodes too; a scalar is only whole once a delimiter follows
+                after = end
+                while after < len(buffer) and buffer[after] in _WHITESPACE:
+                    after += 1
+                if after == len(buffer) or buffer[after] not in ",]":
+                    break
+            yield element
+            pos = end
+        buffer = buffer[pos:]
+
+    buffer += utf8.decode(b"", final=True)
+    if not started or not finished:
+        raise ValueError("Truncated JSON array")
+    if buffer.strip():
+        raise ValueError("Unexpected data after JSON array")
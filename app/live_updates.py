@@ -0,0 +1,121 @@
+from typing import Dict, Iterable, Optional, Set
+from datetime import datetime, timedelta
+import os
+import asyncio
+import logging
+from .change_detector import SectionKey
+from .metrics import LIVE_DROPPED, LIVE_STREAMS
+
+
+class Subscription:
+    """One live stream's queue of section updates; None in the queue means it was dropped"""
+
+    def __init__(self, keys: Iterable[SectionKey], max_queued: int):
+        self.keys = frozenset(keys)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queued + 1)
+        self.max_queued = max_queued
+
+
+class SectionBroker:
+    """In-process pub/sub of section updates, fanned out by (term, CRN)
+
+    Both the check cycle and the SectionPoller publish, and the poller re-reads
+    an overlap window, so updates are deduplicated by section version. A
+    subscriber that falls `max_queued` updates behind is dropped rather than
+    buffered; its client reconnects and starts from a fresh snapshot.
+    """
+
+    def __init__(self, max_queued: Optional[int] = None):
+        self.max_queued = max_queued or int(os.getenv("LIVE_MAX_QUEUED", "100"))
+        self.subscribers: Dict[SectionKey, Set[Subscription]] = {}
+        # Last version published per subscribed key
+        self.versions: Dict[SectionKey, int] = {}
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self.subscribers)
+
+    def subscribe(self, keys: Iterable[SectionKey]) -> Subscription:
+        subscription = Subscription(keys, self.max_queued)
+        for key in subscription.keys:
+            self.subscribers.setdefault(key, set()).add(subscription)
+        LIVE_STREAMS.inc()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        removed = False
+        for key in subscription.keys:
+            subscribers = self.subscribers.get(key)
+            if subscribers and subscription in subscribers:
+                removed = True
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscribers[key]
+                    self.versions.pop(key, None)
+        if removed:
+            LIVE_STREAMS.inc(amount=-1)
+
+    def publish(self, term: str, section: Dict, version: int):
+        key = (term, section["CRN"])
+        subscribers = self.subscribers.get(key)
+        if not subscribers or version <= self.versions.get(key, -1):
+            return
+        self.versions[key] = version
+
+        update = {"term": term, "crn": section["CRN"], "status": section.get("Status"), "version": version}
+        for subscription in list(subscribers):
+            if subscription.queue.qsize() >= subscription.max_queued:
+                self.unsubscribe(subscription)
+                subscription.queue.put_nowait(None)
+                LIVE_DROPPED.inc()
+            else:
+                subscription.queue.put_nowait(update)
+
+
+class SectionPoller:
+    """Feeds the broker from stored sections on workers that aren't running the check cycle
+
+    The leader publishes straight from its cycle. Every other worker reads the
+    sections written since its last poll, and only while it has subscribers.
+    """
+
+    def __init__(self, db, broker: SectionBroker, scheduler, interval: Optional[float] = None,
+                 overlap: Optional[float] = None):
+        self.db = db
+        self.broker = broker
+        self.scheduler = scheduler
+        self.interval = interval or float(os.getenv("LIVE_POLL_SECONDS", "1"))
+        # Re-read this far back to cover clock skew between workers and slow batches
+        self.overlap = timedelta(seconds=overlap if overlap is not None else float(os.getenv("LIVE_POLL_OVERLAP_SECONDS", "5")))
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        last_poll = datetime.utcnow()
+        while True:
+            await asyncio.sleep(self.interval)
+            now = datetime.utcnow()
+            if self.scheduler.is_leader or not self.broker.has_subscribers:
+                # New subscribers start from a snapshot, so nothing before now is owed
+                last_poll = now
+                continue
+            try:
+                for row in await self.db.get_sections_updated_since(last_poll - self.overlap):
+                    self.broker.publish(row["term"], row["section"], row["version"])
+                last_poll = now
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Failed to poll section updates: {str(e)}")
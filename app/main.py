@@ -1,51 +1,56 @@
-from fastapi import FastAPI, Request, Form, BackgroundTasks, HTTPException
+from fastapi import FastAPI, Request, Form, HTTPException, Depends
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import RedirectResponse
+from fastapi.responses import PlainTextResponse, RedirectResponse, Response, StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
 from typing import List, Optional
 import os
-from pathlib import Path
-from .database import Database
-from .course_checker import CourseChecker
-from .email_sender import EmailSender
-from .utils import get_course_sections, format_status_message
+import json
+import time
+from .metrics import QUEUE_DEPTH, render as render_metrics
+from .section_history import summarize_openings
+from .services import Services, get_services
+from .utils import DEFAULT_TERM, parse_watch_rows
 from dotenv import load_dotenv
-from .sendgrid_service import SendGridService
 import asyncio
-import nest_asyncio
-from .background_tasks import initialize_watch
 import logging
-from datetime import datetime
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
 
 load_dotenv()
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Built here rather than at import so each worker gets its own, inside its own loop
+    try:
+        services = Services()
+        print("All services initialized successfully")
+    except Exception as e:
+        print(f"Failed to initialize services: {e}")
+        raise
+    app.state.services = services
+    await services.start()
+    try:
+        yield
+    finally:
+        await services.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 # Configure templates directory
 templates = Jinja2Templates(directory="templates")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# Apply nest_asyncio to allow nested event loops
-nest_asyncio.apply()
-
-# Initialize services with error handling
-try:
-    db = Database()
-    sendgrid_service = SendGridService()
-    email_sender = EmailSender(email_service=sendgrid_service)
-    course_checker = CourseChecker(db, email_sender)
-    print("All services initialized successfully")
-except Exception as e:
-    print(f"Failed to initialize services: {e}")
-    raise
-
 @app.get("/api/healthcheck")
-async def healthcheck():
+async def healthcheck(services: Services = Depends(get_services)):
     try:
         # Test database connection
-        await db.client.admin.command('ping')
+        await services.db.ping()
         
-        # Test SendGrid connection
-        if not sendgrid_service.sg:
+        # Test SendGrid configuration; the client itself is created on first send
+        if not services.sendgrid_service.configured:
             raise ValueError("SendGrid not initialized")
             
         # All checks passed
@@ -62,61 +67,214 @@ async def healthcheck():
             detail="Service unavailable"
         )
 
-@app.get("/")
-async def home(request: Request):
+@app.get("/metrics")
+async def metrics(services: Services = Depends(get_services)):
+    """Prometheus text exposition of this worker's counters and timers"""
+    try:
+        for queue, depth in (await services.db.queue_depths()).items():
+            QUEUE_DEPTH.set(depth, queue)
+    except Exception as e:
+        logging.error(f"Failed to read queue depths: {str(e)}")
+    QUEUE_DEPTH.set(services.backfill.queue.qsize(), "backfill")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+WATCH_FIELDS = {
+    "subject", "course_number", "crns", "email", "term", "status",
+    "section_crns", "course_info", "created_at", "updated_at"
+}
+PAGE_SIZE = int(os.getenv("WATCHES_PAGE_SIZE", "50"))
+
+@app.get("/api/watches")
+async def list_watches_api(
+    email: Optional[str] = None,
+    status: Optional[str] = None,
+    crn: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = PAGE_SIZE,
+    fields: Optional[str] = None,
+    services: Services = Depends(get_services)
+):
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    if field_list and not set(field_list) <= WATCH_FIELDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(sorted(set(field_list) - WATCH_FIELDS))}"
+        )
+    try:
+        watches, next_cursor = await services.db.list_watches(
+            email=email,
+            status=status,
+            crn=crn,
+            after=after,
+            limit=max(1, min(limit, 200)),
+            fields=field_list
+        )
+    except InvalidId:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    except Exception as e:
+        logging.error(f"Error listing watches: {e}")
+        raise HTTPException(status_code=503, detail="Service unavailable")
+
+    return jsonable_encoder(
+        {"watches": watches, "next": next_cursor},
+        custom_encoder={ObjectId: str}
+    )
+
+HISTORY_MAX_DAYS = int(os.getenv("HISTORY_MAX_DAYS", "365"))
+
+@app.get("/api/sections/{crn}/history")
+async def section_history(
+    crn: str,
+    term: str = DEFAULT_TERM,
+    days: float = 30,
+    services: Services = Depends(get_services)
+):
+    """A section's status transitions over the last `days`, with how often and when it opened"""
+    if not 0 < days <= HISTORY_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"days must be between 0 and {HISTORY_MAX_DAYS}")
+    until = datetime.utcnow()
+    since = until - timedelta(days=days)
     try:
-        # Reduce timeout and add more retries
-        for attempt in range(3):  # Try 3 times
+        events = await services.db.get_section_history(term, crn, since=since, until=until)
+        record = await services.db.get_section_record(term, crn)
+    except Exception as e:
+        logging.error(f"Error reading section history: {e}")
+        raise HTTPException(status_code=503, detail="Service unavailable")
+
+    if record is None and not events:
+        raise HTTPException(status_code=404, detail="Section not tracked")
+    record = record or {}
+
+    return jsonable_encoder({
+        "term": term,
+        "crn": crn,
+        "since": since,
+        "until": until,
+        "summary": summarize_openings(
+            events, since, until, record.get("section", {}).get("Status"), record.get("created_at")
+        ),
+        "events": events
+    })
+
+LIVE_MAX_SECTIONS = int(os.getenv("LIVE_MAX_SECTIONS", "2000"))
+LIVE_HEARTBEAT_SECONDS = float(os.getenv("LIVE_HEARTBEAT_SECONDS", "15"))
+# Streams end after this long and the browser reconnects, which rebalances
+# them across workers and lets graceful shutdowns finish
+LIVE_STREAM_SECONDS = float(os.getenv("LIVE_STREAM_SECONDS", "300"))
+
+def _sse(update):
+    return f"event: section\ndata: {json.dumps(update)}\n\n"
+
+@app.get("/api/sections/stream")
+async def section_stream(
+    sections: Optional[str] = None,
+    after: Optional[str] = None,
+    services: Services = Depends(get_services)
+):
+    """Server-sent events with the status of some sections, then every change to them
+
+    Either `sections` ("term:CRN,...") or the sections of the home page that
+    starts after `after`, which keeps the page's own stream URL short however
+    many sections it shows. Beyond LIVE_MAX_SECTIONS the set is clamped.
+    """
+    keys = set()
+    if sections is not None:
+        for part in filter(None, (p.strip() for p in sections.split(","))):
+            term, _, crn = part.rpartition(":")
+            keys.add((term or DEFAULT_TERM, crn))
+    else:
+        try:
+            watches, _ = await services.db.list_watches(after=after, limit=PAGE_SIZE, fields=["term", "section_crns"])
+        except InvalidId:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        except Exception as e:
+            logging.error(f"Error resolving live sections: {e}")
+            raise HTTPException(status_code=503, detail="Service unavailable")
+        for watch in watches:
+            keys.update((watch.get("term") or DEFAULT_TERM, crn) for crn in watch.get("section_crns") or ())
+
+    if not keys:
+        # 204 tells EventSource not to reconnect
+        return Response(status_code=204)
+    if len(keys) > LIVE_MAX_SECTIONS:
+        logging.warning(f"Live stream asked for {len(keys)} sections, following the first {LIVE_MAX_SECTIONS}")
+        keys = set(sorted(keys)[:LIVE_MAX_SECTIONS])
+
+    async def events():
+        # Subscribe before reading the snapshot so nothing written in between is missed
+        subscription = services.broker.subscribe(keys)
+        sent = {}
+        try:
+            yield "retry: 3000\n\n"
             try:
-                watches = await asyncio.wait_for(
-                    db.get_all_watches(),
-                    timeout=5.0  # Reduced from 15.0
-                )
-                break  # If successful, break the loop
-            except asyncio.TimeoutError:
-                if attempt == 2:  # Last attempt
-                    raise
-                continue
-        
-        async def process_watch(watch):
-            if watch.get('status') == 'initializing':
-                return watch
-            
-            if not watch.get('course_info'):
+                states = await services.db.get_section_states(list(keys))
+            except Exception as e:
+                # Ending the stream makes the browser retry
+                logging.error(f"Error reading live snapshot: {e}")
+                return
+            for (term, crn), state in states.items():
+                sent[(term, crn)] = state.version
+                yield _sse({"term": term, "crn": crn, "status": state.status, "version": state.version})
+
+            deadline = time.monotonic() + LIVE_STREAM_SECONDS
+            while time.monotonic() < deadline:
                 try:
-                    sections = await asyncio.wait_for(
-                        get_course_sections(
-                            subject=watch.get('subject'),
-                            course_number=watch.get('course_number'),
-                            crns=watch.get('crns')
-                        ),
-                        timeout=5.0
-                    )
-                    if sections:
-                        await db.update_course_info(watch['_id'], sections)
-                        watch['course_info'] = sections
+                    update = await asyncio.wait_for(subscription.queue.get(), LIVE_HEARTBEAT_SECONDS)
                 except asyncio.TimeoutError:
-                    logging.warning(f"Timeout fetching course info for watch {watch.get('_id')}")
-            return watch
+                    yield ": keepalive\n\n"
+                    continue
+                if update is None:
+                    # Fell too far behind; the reconnect starts from a fresh snapshot
+                    return
+                key = (update["term"], update["crn"])
+                if update["version"] > sent.get(key, -1):
+                    sent[key] = update["version"]
+                    yield _sse(update)
+        finally:
+            services.broker.unsubscribe(subscription)
 
-        # Process watches with smaller batch size
-        processed_watches = []
-        batch_size = 3  # Reduced from 5
-        
-        for i in range(0, len(watches), batch_size):
-            batch = watches[i:i + batch_size]
-            tasks = [process_watch(watch) for watch in batch]
-            batch_results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            for result in batch_results:
-                if not isinstance(result, Exception):
-                    processed_watches.append(result)
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/")
+async def home(request: Request, after: Optional[str] = None, services: Services = Depends(get_services)):
+    try:
+        # Render one page from stored state only; Howdy is never called on this path
+        watches, next_cursor = await asyncio.wait_for(
+            services.db.list_watches(after=after, limit=PAGE_SIZE),
+            timeout=5.0
+        )
+
+        for watch in watches:
+            # Only watches never linked to sections; the checker keeps linked ones
+            # up to date, even those whose course Howdy returned nothing for
+            if (watch.get('status') not in ('initializing', 'failed') and 'section_crns' not in watch
+                    and not watch.get('course_info')):
+                services.backfill.enqueue(watch)
+
+        messages = []
+        if await services.howdy_health.degraded():
+            messages.append({
+                "type": "warning",
+                "text": "Howdy is slow or unavailable right now. Seat status below is the last known state."
+            })
 
         return templates.TemplateResponse(
             "index.html",
-            {"request": request, "watches": processed_watches}
+            {
+                "request": request,
+                "watches": watches,
+                "after": after,
+                "next_cursor": next_cursor,
+                "messages": messages
+            }
         )
         
+    except InvalidId:
+        return RedirectResponse(url="/", status_code=303)
     except asyncio.TimeoutError:
         logging.error("Database operation timed out")
         return templates.TemplateResponse(
@@ -133,11 +291,11 @@ async def home(request: Request):
 
 @app.post("/watch")
 async def add_watch(
-    background_tasks: BackgroundTasks,
     subject: Optional[str] = Form(None),
     course_number: Optional[str] = Form(None),
     crns: Optional[str] = Form(None),
-    email: str = Form(...)
+    email: str = Form(...),
+    services: Services = Depends(get_services)
 ):
     try:
         if not crns and not (subject and course_number):
@@ -150,7 +308,7 @@ async def add_watch(
         
         # Increased timeout and added retry logic
         try:
-            watch_id = await db.add_watch_minimal(subject, course_number, crn_list, email)
+            await services.db.add_watch_minimal(subject, course_number, crn_list, email)
         except Exception as e:
             logging.error(f"Database operation failed: {e}")
             raise HTTPException(
@@ -158,14 +316,8 @@ async def add_watch(
                 detail="Unable to process request. Please try again."
             )
         
-        # Queue initialization in background
-        background_tasks.add_task(
-            initialize_watch,
-            watch_id,
-            db,
-            email_sender,
-            get_course_sections
-        )
+        # The init queue picks the watch up from its "initializing" status
+        services.init_queue.notify()
         
         return RedirectResponse(url="/", status_code=303)
         
@@ -175,12 +327,45 @@ async def add_watch(
         logging.error(f"Error in add_watch: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+BULK_IMPORT_MAX_ROWS = int(os.getenv("BULK_IMPORT_MAX_ROWS", "5000"))
+
+@app.post("/api/watches/bulk")
+async def bulk_add_watches(request: Request, services: Services = Depends(get_services)):
+    """Import watches from a JSON list or a CSV with subject,course_number,crns,email columns"""
+    try:
+        watches, errors = parse_watch_rows(
+            await request.body(),
+            request.headers.get("content-type", "application/json")
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse import: {e}")
+
+    if len(watches) + len(errors) > BULK_IMPORT_MAX_ROWS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {BULK_IMPORT_MAX_ROWS} rows per import"
+        )
+
+    try:
+        inserted = await services.db.add_watches_bulk(watches)
+    except Exception as e:
+        logging.error(f"Bulk import failed: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="Unable to process request. Please try again."
+        )
+
+    # One batched initialization pass picks up every imported watch
+    services.init_queue.notify()
+    return {"inserted": len(inserted), "errors": errors}
+
 @app.post("/delete/{watch_id}")
-async def delete_watch(watch_id: str):
+async def delete_watch(watch_id: str, services: Services = Depends(get_services)):
     try:
-        success = await db.delete_watch(watch_id)
+        success = await services.db.delete_watch(watch_id)
         if not success:
             raise HTTPException(status_code=404, detail="Watch not found")
+        await services.watch_set.mark_changed()
         return RedirectResponse(url="/", status_code=303)
     except Exception as e:
         print(f"Error in delete_watch: {e}")
@@ -0,0 +1,327 @@
+from datetime import datetime, timedelta
+from bson.objectid import ObjectId
+import logging
+from .change_detector import StoredState, fingerprint
+from .storage import Storage, new_watch_document
+from .utils import DEFAULT_TERM, section_to_dict
+
+
+def _object_id(watch_id):
+    return ObjectId(watch_id) if isinstance(watch_id, str) else watch_id
+
+
+class MemoryStorage(Storage):
+    """Process-local backend for tests, benchmarks and single-worker deployments
+
+    Nothing survives a restart and nothing is shared between workers, so the
+    lease always goes to the only process that asks.
+    """
+
+    def __init__(self):
+        self.watches = {}
+        self.sections = {}
+        # (term, CRN) -> ids of the watches referencing it
+        self.watchers = {}
+        # (term, CRN) -> transitions in time order
+        self.history = {}
+        self.leases = {}
+        self.status = {}
+        self.outbox = {}
+        self.outbox_keys = set()
+
+    # Watches
+
+    def _copy(self, watch):
+        watch = dict(watch)
+        if "section_crns" in watch:
+            term = watch.get("term", DEFAULT_TERM)
+            watch["course_info"] = [
+                self.sections[(term, crn)]["section"]
+                for crn in watch["section_crns"]
+                if (term, crn) in self.sections
+            ]
+        return watch
+
+    async def get_all_watches(self):
+        return [self._copy(watch) for watch in self.watches.values()]
+
+    async def list_watches(self, email=None, status=None, crn=None, after=None, limit=50, fields=None):
+        after = ObjectId(after) if after else None
+        matches = []
+        for watch_id in sorted(self.watches):
+            watch = self.watches[watch_id]
+            if after and watch_id <= after:
+                continue
+            if email and watch.get("email") != email:
+                continue
+            if status and watch.get("status") != status:
+                continue
+            if crn and crn not in (watch.get("crns") or ()):
+                continue
+            matches.append(watch)
+            if len(matches) > limit:
+                break
+
+        next_cursor = str(matches[limit - 1]["_id"]) if len(matches) > limit else None
+        watches = [self._copy(watch) for watch in matches[:limit]]
+        if fields:
+            keep = set(fields) | {"_id"}
+            watches = [{k: v for k, v in watch.items() if k in keep} for watch in watches]
+        return watches, next_cursor
+
+    async def add_watch_minimal(self, subject, course_number, crns, email):
+        document = new_watch_document(subject, course_number, crns, email, datetime.utcnow())
+        document["_id"] = ObjectId()
+        self.watches[document["_id"]] = document
+        return document["_id"]
+
+    async def add_watches_bulk(self, watches):
+        now = datetime.utcnow()
+        ids = []
+        for watch in watches:
+            document = new_watch_document(watch.subject, watch.course_number, watch.crns or [], watch.email, now)
+            document["_id"] = ObjectId()
+            self.watches[document["_id"]] = document
+            ids.append(document["_id"])
+        return ids
+
+    async def update_watch_status(self, watch_id, status):
+        watch = self.watches.get(_object_id(watch_id))
+        if watch is None or watch.get("status") == status:
+            return False
+        watch.update(status=status, updated_at=datetime.utcnow())
+        return True
+
+    async def get_watch_by_id(self, watch_id):
+        try:
+            watch = self.watches.get(_object_id(watch_id))
+            return self._copy(watch) if watch else None
+
+        except Exception as e:
+            logging.error(f"Failed to get watch: {str(e)}")
+            return None
+
+    async def delete_watch(self, watch_id):
+        try:
+            watch = self.watches.pop(_object_id(watch_id), None)
+        except Exception as e:
+            logging.error(f"Failed to delete watch: {str(e)}")
+            return False
+        if watch is None:
+            return False
+        self._unindex(watch)
+        return True
+
+    def _unindex(self, watch):
+        term = watch.get("term", DEFAULT_TERM)
+        for crn in watch.get("section_crns", ()):
+            self.watchers.get((term, crn), set()).discard(watch["_id"])
+
+    async def link_watch_sections(self, watch_id, crns):
+        watch = self.watches.get(_object_id(watch_id))
+        if watch is None:
+            return False
+        self._unindex(watch)
+        watch["section_crns"] = list(crns)
+        watch["updated_at"] = datetime.utcnow()
+        watch.pop("course_info", None)
+        term = watch.get("term", DEFAULT_TERM)
+        for crn in watch["section_crns"]:
+            self.watchers.setdefault((term, crn), set()).add(watch["_id"])
+        return True
+
+    async def link_watches(self, links):
+        for watch_id, crns in links:
+            await self.link_watch_sections(watch_id, crns)
+
+    async def get_watchers(self, term, crns):
+        ids = set()
+        for crn in crns:
+            ids.update(self.watchers.get((term, crn), ()))
+        return [self._copy(self.watches[watch_id]) for watch_id in sorted(ids) if watch_id in self.watches]
+
+    # Sections
+
+    def _store_section(self, term, section, section_fingerprint, now, overwrite=True, version=0):
+        key = (term, section["CRN"])
+        if not overwrite and key in self.sections:
+            return
+        previous = self.sections.get(key)
+        self.sections[key] = {
+            "term": term,
+            "crn": section["CRN"],
+            "section": section_to_dict(section),
+            "fingerprint": section_fingerprint,
+            "version": version,
+            "created_at": previous["created_at"] if previous else now,
+            "updated_at": now
+        }
+
+    async def upsert_sections(self, term, sections, overwrite=True):
+        now = datetime.utcnow()
+        for section in sections:
+            self._store_section(term, section, fingerprint(section), now, overwrite)
+
+    async def apply_change_set(self, change_set):
+        now = datetime.utcnow()
+        for term, section, fp, version in change_set.upserts:
+            self._store_section(term, section, fp, now, version=version)
+
+    async def get_section_states(self, keys):
+        states = {}
+        for key in keys:
+            doc = self.sections.get(tuple(key))
+            if doc is not None:
+                states[tuple(key)] = StoredState(doc["fingerprint"], doc["section"].get("Status"), doc["version"])
+        return states
+
+    async def get_section_record(self, term, crn):
+        doc = self.sections.get((term, crn))
+        if doc is None:
+            return None
+        return {key: value for key, value in doc.items() if key != "fingerprint"}
+
+    async def get_sections_updated_since(self, since):
+        return [
+            {key: doc[key] for key in ("term", "crn", "section", "version", "updated_at")}
+            for doc in self.sections.values()
+            if doc["updated_at"] > since
+        ]
+
+    # Section history
+
+    async def record_transitions(self, transitions):
+        now = datetime.utcnow()
+        for change in transitions:
+            events = self.history.setdefault((change.term, change.section["CRN"]), [])
+            if any(event["version"] == change.version for event in events):
+                continue
+            events.append({
+                "at": now,
+                "from": change.old_status,
+                "to": change.section["Status"],
+                "version": change.version
+            })
+
+    async def get_section_history(self, term, crn, since=None, until=None):
+        return [
+            dict(event)
+            for event in self.history.get((term, crn), ())
+            if (since is None or event["at"] >= since) and (until is None or event["at"] < until)
+        ]
+
+    # Leases
+
+    async def acquire_lease(self, name, owner, ttl_seconds):
+        now = datetime.utcnow()
+        lease = self.leases.get(name)
+        if lease and lease["owner"] != owner and lease["expires_at"] >= now:
+            return False
+        self.leases[name] = {"owner": owner, "expires_at": now + timedelta(seconds=ttl_seconds)}
+        return True
+
+    async def release_lease(self, name, owner):
+        lease = self.leases.get(name)
+        if lease and lease["owner"] == owner:
+            del self.leases[name]
+            return True
+        return False
+
+    # Shared status
+
+    async def put_status(self, name, fields):
+        self.status[name] = {**fields, "updated_at": datetime.utcnow()}
+
+    async def get_status(self, name):
+        doc = self.status.get(name)
+        return dict(doc) if doc else None
+
+    # Outbox
+
+    async def enqueue_emails(self, messages):
+        now = datetime.utcnow()
+        inserted = 0
+        for message in messages:
+            if message["key"] in self.outbox_keys:
+                continue
+            email_id = ObjectId()
+            self.outbox[email_id] = {
+                **message,
+                "_id": email_id,
+                "status": "pending",
+                "attempts": 0,
+                "next_attempt_at": now,
+                "created_at": now
+            }
+            self.outbox_keys.add(message["key"])
+            inserted += 1
+        return inserted
+
+    async def claim_email(self, owner, lease_seconds):
+        now = datetime.utcnow()
+        due = [
+            message for message in self.outbox.values()
+            if (message["status"] == "pending" and message["next_attempt_at"] <= now)
+            or (message["status"] == "sending" and message["claimed_until"] < now)
+        ]
+        if not due:
+            return None
+        message = min(due, key=lambda m: m["next_attempt_at"])
+        message.update(status="sending", claimed_by=owner, claimed_until=now + timedelta(seconds=lease_seconds))
+        return dict(message)
+
+    async def mark_email_sent(self, email_id):
+        message = self.outbox.get(email_id)
+        if message:
+            message.update(status="sent", sent_at=datetime.utcnow())
+
+    async def retry_email(self, email_id, attempts, next_attempt_at, error):
+        message = self.outbox.get(email_id)
+        if message:
+            message.update(status="pending", attempts=attempts, next_attempt_at=next_attempt_at, last_error=error)
+
+    async def dead_letter_email(self, email_id, attempts, error):
+        message = self.outbox.get(email_id)
+        if message:
+            message.update(status="dead", attempts=attempts, last_error=error, dead_at=datetime.utcnow())
+
+    # Initialization queue
+
+    async def claim_initializing_watches(self, owner, limit, claim_seconds):
+        now = datetime.utcnow()
+        claimed = []
+        for watch_id in sorted(self.watches):
+            watch = self.watches[watch_id]
+            if watch.get("status") != "initializing":
+                continue
+            if watch.get("init_claimed_until") and watch["init_claimed_until"] >= now:
+                continue
+            watch.update(init_claimed_by=owner, init_claimed_until=now + timedelta(seconds=claim_seconds))
+            claimed.append(self._copy(watch))
+            if len(claimed) == limit:
+                break
+        return claimed
+
+    async def finish_initialization(self, active, failed):
+        now = datetime.utcnow()
+        for watch_id, crns in active:
+            watch = self.watches.get(watch_id)
+            if watch is None:
+                continue
+            await self.link_watch_sections(watch_id, crns)
+            watch.update(status="active", updated_at=now)
+            watch.pop("init_claimed_by", None)
+            watch.pop("init_claimed_until", None)
+        for watch_id in failed:
+            watch = self.watches.get(watch_id)
+            if watch is None:
+                continue
+            watch.update(status="failed", updated_at=now)
+            watch.pop("init_claimed_by", None)
+            watch.pop("init_claimed_until", None)
+
+    async def queue_depths(self):
+        return {
+            "outbox": sum(1 for message in self.outbox.values() if message["status"] == "pending"),
+            "initializing": sum(1 for watch in self.watches.values() if watch.get("status") == "initializing")
+        }
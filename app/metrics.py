@@ -0,0 +1,190 @@
+from typing import Callable, Dict, List, Optional, Tuple
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+import cProfile
+import functools
+import logging
+import os
+import time
+
+# Seconds; spans a cached lookup up to a slow full-term sweep
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry: List["_Metric"] = []
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        _registry.append(self)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        return "\n".join([f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self.samples()])
+
+
+class Counter(_Metric):
+    """Monotonic count per label combination"""
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self.values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labels, k)} {v}" for k, v in self.values.items()]
+
+
+class Gauge(Counter):
+    """Last value set per label combination"""
+    kind = "gauge"
+
+    def set(self, value: float, *labels):
+        self.values[labels] = value
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket latency histogram per label combination"""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum, count]
+        self.series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, (counts, total, count) in self.series.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), counts):
+                cumulative += n
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, labels)} {count}")
+        return lines
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format"""
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+def timed(histogram: Histogram, *labels, errors: Optional[Counter] = None) -> Callable:
+    """Decorate a coroutine function to record its duration, and failures in `errors`"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except BaseException:
+                if errors is not None:
+                    errors.inc(*labels)
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - start, *labels)
+        return wrapper
+    return decorator
+
+
+HOWDY_LOOKUP_SECONDS = Histogram(
+    "howdy_lookup_seconds", "get_course_sections calls, including cache hits"
+)
+HOWDY_REQUEST_SECONDS = Histogram(
+    "howdy_request_seconds", "Upstream Howdy page requests", ("outcome",)
+)
+HOWDY_ROWS = Counter("howdy_rows_total", "Rows parsed from Howdy responses")
+HOWDY_CIRCUIT_STATE = Gauge("howdy_circuit_state", "Howdy circuit breaker: 0 closed, 1 half-open, 2 open")
+HOWDY_CONCURRENCY_LIMIT = Gauge("howdy_concurrency_limit", "Current adaptive cap on in-flight Howdy requests")
+HOWDY_REJECTED = Counter("howdy_rejected_total", "Howdy requests failed fast by the open circuit")
+STORAGE_SECONDS = Histogram(
+    "storage_operation_seconds", "Storage backend calls", ("backend", "operation")
+)
+STORAGE_ERRORS = Counter(
+    "storage_operation_errors_total", "Storage backend calls that raised", ("backend", "operation")
+)
+EMAIL_SEND_SECONDS = Histogram("email_send_seconds", "SendGrid API calls", ("method",))
+EMAILS = Counter("outbox_emails_total", "Outbox deliveries by result", ("outcome",))
+CHECK_CYCLE_SECONDS = Histogram("check_cycle_seconds", "Whole check_courses cycles")
+CHECK_PHASE_SECONDS = Histogram("check_phase_seconds", "Phases of a check cycle", ("phase",))
+CHECK_CYCLES = Counter("check_cycles_total", "Check cycles by result", ("outcome",))
+CHECK_QUERIES = Counter("check_queries_total", "Distinct upstream queries a cycle found due")
+CHECK_TRANSITIONS = Counter("check_transitions_total", "Seat status changes detected")
+QUEUE_DEPTH = Gauge("queue_depth", "Items waiting in each work queue", ("queue",))
+LIVE_STREAMS = Gauge("live_streams", "Open server-sent event streams of section updates")
+LIVE_DROPPED = Counter("live_dropped_total", "Live streams dropped for falling too far behind")
+
+
+class CycleTrace:
+    """Phase timings of one check cycle, optionally with a cProfile of the whole cycle
+
+    CHECK_TRACE_SECONDS logs the phase breakdown of every cycle at least that
+    slow. CHECK_PROFILE_DIR writes a .prof file per cycle; the profile covers
+    everything the event loop ran meanwhile, not just the checker.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+        trace_seconds = os.getenv("CHECK_TRACE_SECONDS")
+        self.trace_seconds = float(trace_seconds) if trace_seconds else None
+        self.profile_dir = os.getenv("CHECK_PROFILE_DIR")
+        self.profiler = None
+        if self.profile_dir:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.phases.append((name, elapsed))
+            CHECK_PHASE_SECONDS.observe(elapsed, name)
+
+    def finish(self, outcome: str):
+        elapsed = time.perf_counter() - self.started
+        CHECK_CYCLE_SECONDS.observe(elapsed)
+        CHECK_CYCLES.inc(outcome)
+
+        if self.profiler:
+            self.profiler.disable()
+            path = os.path.join(self.profile_dir, f"cycle-{datetime.utcnow():%Y%m%dT%H%M%S.%f}.prof")
+            try:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                self.profiler.dump_stats(path)
+            except OSError as e:
+                logging.error(f"Failed to write cycle profile: {str(e)}")
+
+        if self.trace_seconds is not None and elapsed >= self.trace_seconds:
+            breakdown = ", ".join(f"{name} {seconds * 1000:.1f}ms" for name, seconds in self.phases)
+            logging.warning(f"Check cycle took {elapsed:.2f}s ({outcome}): {breakdown}")
@@ -0,0 +1,47 @@
+from typing import Dict, List, NamedTuple, Tuple
+import hashlib
+from .change_detector import SectionChange
+
+
+def change_id(change: SectionChange) -> str:
+    return f"{change.term}:{change.section['CRN']}:{change.version}"
+
+
+class Digest(NamedTuple):
+    """One email: the same set of changes going to every listed recipient"""
+    changes: Tuple[SectionChange, ...]
+    recipients: List[str]
+
+    @property
+    def key(self) -> str:
+        """Idempotency key, stable for the same set of changes"""
+        if len(self.changes) == 1:
+            return f"status:{change_id(self.changes[0])}"
+        ids = "|".join(change_id(c) for c in self.changes)
+        return f"digest:{hashlib.blake2b(ids.encode(), digest_size=12).hexdigest()}"
+
+
+class NotificationAggregator:
+    """Collapses a cycle's status changes into one digest per recipient address"""
+
+    def __init__(self):
+        self.by_email: Dict[str, Dict[str, SectionChange]] = {}
+
+    def add(self, email: str, change: SectionChange):
+        # Keyed by change, so watching a CRN through several watches counts once
+        self.by_email.setdefault(email, {})[change_id(change)] = change
+
+    def __len__(self):
+        return len(self.by_email)
+
+    def digests(self) -> List[Digest]:
+        """Group recipients whose digests are identical so they can share one send"""
+        groups: Dict[Tuple[str, ...], List[str]] = {}
+        for email, changes in self.by_email.items():
+            groups.setdefault(tuple(sorted(changes)), []).append(email)
+
+        digests = []
+        for ids, emails in sorted(groups.items()):
+            changes = self.by_email[emails[0]]
+            digests.append(Digest(tuple(changes[i] for i in ids), sorted(emails)))
+        return digests
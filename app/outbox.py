@@ -0,0 +1,120 @@
+from typing import Dict, Optional, Set
+from datetime import datetime, timedelta
+import os
+import socket
+import uuid
+import random
+import asyncio
+import logging
+from .metrics import EMAILS
+
+
+class OutboxWorker:
+    """Drains the outbox collection with retries, backoff and dead-lettering
+
+    One claim loop per process hands emails to up to `concurrency` concurrent
+    sends. While the outbox is empty it polls less and less often, up to
+    EMAIL_MAX_POLL_SECONDS; notify() brings it back at once.
+    """
+
+    def __init__(self, db, email_service, concurrency: Optional[int] = None):
+        self.db = db
+        self.email_service = email_service
+        self.concurrency = concurrency or int(os.getenv("EMAIL_WORKERS", "4"))
+        self.max_attempts = int(os.getenv("EMAIL_MAX_ATTEMPTS", "6"))
+        self.backoff_base = float(os.getenv("EMAIL_BACKOFF_SECONDS", "30"))
+        self.poll_interval = float(os.getenv("EMAIL_POLL_SECONDS", "1"))
+        self.max_poll_interval = float(os.getenv("EMAIL_MAX_POLL_SECONDS", "30"))
+        # Longer than any single send, so a live sender never loses its claim
+        self.claim_seconds = float(os.getenv("EMAIL_CLAIM_SECONDS", "120"))
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._task: Optional[asyncio.Task] = None
+        self._sending: Set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logging.info(f"Outbox worker started with {self.concurrency} senders")
+
+    async def stop(self):
+        tasks = [task for task in (self._task, *self._sending) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._sending.clear()
+
+    def notify(self):
+        """Wake the claim loop after enqueueing from this process"""
+        self._wakeup.set()
+
+    async def _run(self):
+        slots = asyncio.Semaphore(self.concurrency)
+        idle = self.poll_interval
+        while True:
+            # Only claim what a free sender can start on, so claims don't sit and expire
+            await slots.acquire()
+            # Cleared before claiming so a notify() during the claim isn't lost
+            self._wakeup.clear()
+            try:
+                message = await self.db.claim_email(self.owner, self.claim_seconds)
+            except asyncio.CancelledError:
+                slots.release()
+                raise
+            except Exception as e:
+                logging.error(f"Failed to claim outbox email: {e}")
+                message = None
+
+            if message is None:
+                slots.release()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), idle)
+                    idle = self.poll_interval
+                except asyncio.TimeoutError:
+                    idle = min(idle * 2, self.max_poll_interval)
+                continue
+
+            idle = self.poll_interval
+            task = asyncio.create_task(self._deliver(message))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+    async def _deliver(self, message: Dict):
+        attempts = message.get("attempts", 0) + 1
+        try:
+            if "recipients" in message:
+                success = await self.email_service.send_bulk_email(
+                    recipients=message["recipients"],
+                    subject=message["subject"],
+                    body=message["body"]
+                )
+            else:
+                success = await self.email_service.send_email(
+                    to=message["to"],
+                    subject=message["subject"],
+                    body=message["body"]
+                )
+            error = None if success else "send_email returned False"
+        except Exception as e:
+            success = False
+            error = str(e)
+
+        try:
+            if success:
+                EMAILS.inc("sent")
+                await self.db.mark_email_sent(message["_id"])
+            elif attempts >= self.max_attempts:
+                EMAILS.inc("dead")
+                logging.error(f"Dead-lettering email {message['key']} after {attempts} attempts: {error}")
+                await self.db.dead_letter_email(message["_id"], attempts, error)
+            else:
+                EMAILS.inc("retried")
+                delay = self.backoff_base * 2 ** (attempts - 1) * random.uniform(0.5, 1.5)
+                await self.db.retry_email(
+                    message["_id"], attempts, datetime.utcnow() + timedelta(seconds=delay), error
+                )
+        except Exception as e:
+            # The claim expires and another sender picks the email up again
+            logging.error(f"Failed to record outcome of email {message['key']}: {e}")
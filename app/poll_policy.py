@@ -0,0 +1,98 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from collections import deque
+from datetime import datetime, timezone
+import os
+import time
+import logging
+from .change_detector import SectionKey
+from .fetch_planner import FetchKey
+
+
+def parse_hot_windows(spec: str) -> List[Tuple[float, float]]:
+    """Parse "start/end,start/end" ISO-8601 pairs (UTC unless an offset is given)"""
+    windows = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        try:
+            start, end = (datetime.fromisoformat(x.strip()) for x in part.split("/"))
+            start, end = (d if d.tzinfo else d.replace(tzinfo=timezone.utc) for d in (start, end))
+            windows.append((start.timestamp(), end.timestamp()))
+        except ValueError as e:
+            logging.error(f"Ignoring invalid hot window {part!r}: {e}")
+    return windows
+
+
+class SectionState:
+    __slots__ = ("status", "next_check", "changes")
+
+    def __init__(self):
+        self.status: Optional[str] = None
+        self.next_check = 0.0
+        self.changes = deque(maxlen=32)
+
+
+class AdaptivePollPolicy:
+    """Keeps a next-check time per (term, CRN) so volatile sections are polled often and dormant ones rarely"""
+
+    def __init__(self, min_interval: Optional[float] = None, max_interval: Optional[float] = None,
+                 hot_windows: Optional[List[Tuple[float, float]]] = None):
+        self.min_interval = min_interval or float(os.getenv("POLL_MIN_SECONDS", "5"))
+        self.max_interval = max_interval or float(os.getenv("POLL_MAX_SECONDS", "600"))
+        self.volatility_window = float(os.getenv("POLL_VOLATILITY_WINDOW_SECONDS", "3600"))
+        self.hot_factor = float(os.getenv("POLL_HOT_FACTOR", "4"))
+        self.hot_windows = hot_windows if hot_windows is not None else parse_hot_windows(os.getenv("POLL_HOT_WINDOWS", ""))
+        self.sections: Dict[SectionKey, SectionState] = {}
+        # Next check of queries whose last fetch returned no sections at all
+        self.empty_queries: Dict[FetchKey, float] = {}
+
+    def in_hot_window(self, now: float) -> bool:
+        return any(start <= now < end for start, end in self.hot_windows)
+
+    def is_due(self, key: FetchKey, crns: Iterable[str], now: Optional[float] = None) -> bool:
+        """True if any of the query's CRNs is due; CRNs never seen before are always due"""
+        now = now or time.time()
+        crns = list(crns)
+        if not crns:
+            # Nothing known about what the query covers yet, unless it came back empty last time
+            return self.empty_queries.get(key, 0.0) <= now
+        for crn in crns:
+            state = self.sections.get((key.term, crn))
+            if state is None or state.next_check <= now:
+                return True
+        return False
+
+    def interval(self, state: SectionState, now: float) -> float:
+        recent = sum(1 for t in state.changes if now - t <= self.volatility_window)
+        # Halve the interval for every recent change
+        interval = self.max_interval / (2 ** min(recent, 16))
+        if state.status == "Open":
+            # Watchers of an open section are only waiting for it to close
+            interval *= 2
+        if self.in_hot_window(now):
+            interval /= self.hot_factor
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def observe(self, term: str, sections: Iterable[Dict], now: Optional[float] = None):
+        """Record fetched sections of a term and reschedule each CRN"""
+        now = now or time.time()
+        for section in sections:
+            state = self.sections.setdefault((term, section["CRN"]), SectionState())
+            if state.status is not None and state.status != section["Status"]:
+                state.changes.append(now)
+            state.status = section["Status"]
+            state.next_check = now + self.interval(state, now)
+
+    def observe_query(self, key: FetchKey, expected: Iterable[str], sections: List[Dict], now: Optional[float] = None):
+        """Record one query's result, backing off what it asked for but didn't get
+
+        A CRN Howdy doesn't return (a typo, a cancelled section) would otherwise
+        stay due forever and make its query run on every tick.
+        """
+        now = now or time.time()
+        self.observe(key.term, sections, now)
+        returned = {section["CRN"] for section in sections}
+        for crn in set(expected) - returned:
+            self.sections.setdefault((key.term, crn), SectionState()).next_check = now + self.max_interval
+        if sections:
+            self.empty_queries.pop(key, None)
+        else:
+            self.empty_queries[key] = now + self.max_interval
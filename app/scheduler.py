@@ -0,0 +1,81 @@
+from typing import Optional
+import os
+import socket
+import uuid
+import random
+import asyncio
+import logging
+
+LEASE_NAME = "course-checker"
+
+
+class PollingScheduler:
+    """Runs CourseChecker.check_courses periodically on whichever worker holds the Mongo lease
+
+    The period is a tick, not a poll rate: each check only fetches sections that
+    the checker's AdaptivePollPolicy says are due, from a watch set it caches.
+    """
+
+    def __init__(self, db, course_checker, period: Optional[float] = None,
+                 jitter: Optional[float] = None, lease_seconds: Optional[float] = None):
+        self.db = db
+        self.course_checker = course_checker
+        self.period = period or float(os.getenv("CHECK_PERIOD_SECONDS", "5"))
+        self.jitter = jitter if jitter is not None else float(os.getenv("CHECK_JITTER_SECONDS", "1"))
+        self.lease_seconds = lease_seconds or float(os.getenv("CHECK_LEASE_SECONDS", str(max(self.period * 3, 30))))
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logging.info(f"Polling scheduler started as {self.owner}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.is_leader:
+            await self.db.release_lease(LEASE_NAME, self.owner)
+            self.is_leader = False
+
+    async def _run(self):
+        while True:
+            try:
+                if await self.db.acquire_lease(LEASE_NAME, self.owner, self.lease_seconds):
+                    if not self.is_leader:
+                        logging.info(f"{self.owner} took the polling lease")
+                    self.is_leader = True
+                    await self._run_cycle()
+                elif self.is_leader:
+                    logging.warning(f"{self.owner} lost the polling lease")
+                    self.is_leader = False
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Scheduler cycle failed: {e}")
+
+            # Jitter keeps workers from hitting the lease at the same instant
+            await asyncio.sleep(self.period + random.uniform(0, self.jitter))
+
+    async def _run_cycle(self):
+        """Run one check, renewing the lease so a long cycle isn't taken over mid-way"""
+        cycle = asyncio.create_task(self.course_checker.check_courses())
+        try:
+            while True:
+                done, _ = await asyncio.wait({cycle}, timeout=self.lease_seconds / 3)
+                if done:
+                    return
+                if not await self.db.acquire_lease(LEASE_NAME, self.owner, self.lease_seconds):
+                    logging.warning("Polling lease lost mid-cycle, cancelling check")
+                    self.is_leader = False
+                    cycle.cancel()
+                    return
+        finally:
+            if not cycle.done():
+                cycle.cancel()
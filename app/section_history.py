@@ -0,0 +1,59 @@
+from typing import Dict, List, Optional
+from datetime import datetime
+from statistics import median
+
+
+def summarize_openings(events: List[Dict], since: datetime, until: datetime,
+                       current_status: Optional[str] = None, tracked_since: Optional[datetime] = None) -> Dict:
+    """How often and when a section opened between `since` and `until`
+
+    `events` are one section's transitions in time order. Time open is only
+    counted from when tracking began (`tracked_since`), with the status taken
+    from the first transition, or `current_status` if the section didn't
+    change at all since. Without `tracked_since` it's counted from the first
+    transition, and is None if there wasn't one. Hours and weekdays are UTC.
+    """
+    if tracked_since is not None:
+        start = max(since, tracked_since)
+    else:
+        start = events[0]["at"] if events else None
+    status = events[0]["from"] if events else current_status
+    opened_at = start if status == "Open" and tracked_since is not None else None
+    # A spell already under way at `start` has no known length
+    carried = opened_at is not None
+    open_seconds = 0.0
+    spells = []
+    by_hour = [0] * 24
+    by_weekday = [0] * 7
+    last_opened = None
+
+    for event in events:
+        if event["to"] == "Open" and opened_at is None:
+            opened_at = event["at"]
+            last_opened = event["at"]
+            by_hour[event["at"].hour] += 1
+            by_weekday[event["at"].weekday()] += 1
+        elif event["to"] != "Open" and opened_at is not None:
+            spell = (event["at"] - opened_at).total_seconds()
+            open_seconds += spell
+            if not carried:
+                spells.append(spell)
+            carried = False
+            opened_at = None
+
+    if opened_at is not None:
+        open_seconds += (until - opened_at).total_seconds()
+
+    window = (until - start).total_seconds() if start is not None else 0
+    return {
+        "transitions": len(events),
+        "openings": sum(by_hour),
+        "last_opened_at": last_opened,
+        "open_now": status == "Open" if not events else events[-1]["to"] == "Open",
+        "tracked_since": start,
+        "open_seconds": round(open_seconds, 3) if start is not None else None,
+        "open_fraction": round(open_seconds / window, 4) if window > 0 else None,
+        "median_open_seconds": round(median(spells), 3) if spells else None,
+        "openings_by_hour": by_hour,
+        "openings_by_weekday": by_weekday
+    }
@@ -1,37 +1,59 @@
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
 import os
 import logging
 import asyncio
+from .metrics import EMAIL_SEND_SECONDS, timed
+from concurrent.futures import ThreadPoolExecutor
+
+# SendGrid accepts at most 1000 personalizations per request
+MAX_PERSONALIZATIONS = 1000
 
 class SendGridService:
     def __init__(self):
         self.sg = None
+        self.api_key = None
         self.from_email = None
+        # Dedicated threads so slow SendGrid calls can't starve the loop's default executor
+        self.executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("SENDGRID_THREADS", "8")),
+            thread_name_prefix="sendgrid"
+        )
         self.initialize_service()
 
     def initialize_service(self):
         try:
-            api_key = os.getenv('SENDGRID_API_KEY')
+            self.api_key = os.getenv('SENDGRID_API_KEY')
             self.from_email = os.getenv('SENDGRID_FROM_EMAIL')
             
-            if not api_key:
+            if not self.api_key:
                 raise ValueError("SENDGRID_API_KEY environment variable is not set")
             if not self.from_email:
                 raise ValueError("SENDGRID_FROM_EMAIL environment variable is not set")
                 
-            self.sg = SendGridAPIClient(api_key)
             logging.info("SendGrid service initialized successfully")
             
         except Exception as e:
             logging.error(f"Failed to initialize SendGrid service: {str(e)}")
             raise
 
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_key and self.from_email)
+
+    def _client(self):
+        # The SDK is imported on the first send so startup doesn't pay for it
+        if self.sg is None:
+            from sendgrid import SendGridAPIClient
+            self.sg = SendGridAPIClient(self.api_key)
+        return self.sg
+
+    @timed(EMAIL_SEND_SECONDS, "send_email")
     async def send_email(self, to, subject, body):
         try:
-            if not self.sg:
+            if not self.configured:
                 raise ValueError("SendGrid service not initialized")
 
+            from sendgrid.helpers.mail import Mail
+            sg = self._client()
             message = Mail(
                 from_email=self.from_email,
                 to_emails=to,
@@ -40,8 +62,8 @@ class SendGridService:
             )
             
             # Run the synchronous SendGrid send operation in a thread pool
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(None, lambda: self.sg.send(message))
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(self.executor, lambda: sg.send(message))
             
             if response.status_code in [200, 201, 202]:
                 logging.info(f"Email sent successfully to {to}")
@@ -52,4 +74,39 @@ class SendGridService:
                 
         except Exception as e:
             logging.error(f"Failed to send email: {str(e)}")
-            return False 
\ No newline at end of file
+            return False 
+
+    @timed(EMAIL_SEND_SECONDS, "send_bulk_email")
+    async def send_bulk_email(self, recipients, subject, body):
+        """Send one message to many recipients in a single request, one personalization each"""
+        try:
+            if not self.configured:
+                raise ValueError("SendGrid service not initialized")
+            if len(recipients) > MAX_PERSONALIZATIONS:
+                raise ValueError(f"At most {MAX_PERSONALIZATIONS} recipients per request")
+
+            # is_multiple gives every recipient their own personalization so
+            # nobody sees the other addresses
+            from sendgrid.helpers.mail import Mail
+            sg = self._client()
+            message = Mail(
+                from_email=self.from_email,
+                to_emails=list(recipients),
+                subject=subject,
+                plain_text_content=body,
+                is_multiple=True
+            )
+
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(self.executor, lambda: sg.send(message))
+
+            if response.status_code in [200, 201, 202]:
+                logging.info(f"Email sent successfully to {len(recipients)} recipients")
+                return True
+            else:
+                logging.error(f"Failed to send bulk email. Status code: {response.status_code}")
+                return False
+
+        except Exception as e:
+            logging.error(f"Failed to send bulk email: {str(e)}")
+            return False
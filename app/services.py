@@ -0,0 +1,97 @@
+from typing import Optional
+import os
+import asyncio
+import logging
+from fastapi import Request
+from .background_tasks import InitQueue
+from .backfill import BackfillQueue
+from .check_engine import CheckEngine
+from .course_checker import CourseChecker
+from .email_sender import EmailSender
+from .howdy_client import HowdyClient
+from .live_updates import SectionBroker, SectionPoller
+from .outbox import OutboxWorker
+from .scheduler import PollingScheduler
+from .sendgrid_service import SendGridService
+from .storage import Storage, create_storage
+from .upstream_guard import SharedHealth
+from .watch_set import WatchSet
+
+
+class Services:
+    """Every long-lived service of a worker, built and started by the app lifespan
+
+    Nothing here exists at import time, so importing app.main is cheap and safe
+    to do before gunicorn forks its workers. Connections open on first use.
+    """
+
+    def __init__(self, db: Optional[Storage] = None):
+        self.db = db or create_storage()
+        self.sendgrid_service = SendGridService()
+        self.email_sender = EmailSender(email_service=self.sendgrid_service)
+        self.howdy = HowdyClient()
+        self.check_engine = CheckEngine()
+        self.outbox = OutboxWorker(self.db, self.sendgrid_service)
+        self.broker = SectionBroker()
+        self.watch_set = WatchSet(self.db)
+        self.howdy_health = SharedHealth(self.db, self.howdy.guard)
+        self.course_checker = CourseChecker(
+            self.db, self.email_sender, self.howdy, self.check_engine, self.outbox, self.broker, self.howdy_health,
+            self.watch_set
+        )
+        self.scheduler = PollingScheduler(self.db, self.course_checker)
+        self.live_poller = SectionPoller(self.db, self.broker, self.scheduler)
+        self.backfill = BackfillQueue(self.db, self.howdy, self.check_engine, self.watch_set)
+        self.init_queue = InitQueue(
+            self.db, self.howdy, self.email_sender, self.check_engine, self.outbox, self.watch_set
+        )
+        self.index_retry_seconds = float(os.getenv("INDEX_RETRY_SECONDS", "5"))
+        self._startup: Optional[asyncio.Task] = None
+
+    async def start(self):
+        # Serving doesn't wait on index round trips, but nothing in the
+        # background writes until they exist: the outbox's unique key, the
+        # watchers index and the time-series history collection must win the race
+        self._startup = asyncio.create_task(self._start_workers())
+
+    async def stop(self):
+        if self._startup and not self._startup.done():
+            self._startup.cancel()
+            try:
+                await self._startup
+            except asyncio.CancelledError:
+                pass
+        await self.live_poller.stop()
+        await self.init_queue.stop()
+        await self.outbox.stop()
+        await self.backfill.stop()
+        await self.scheduler.stop()
+        await self.howdy.close()
+        await self.db.close()
+
+    async def _start_workers(self):
+        await self._ensure_indexes()
+        # Every worker runs a scheduler; the storage lease lets only one of them poll
+        if os.getenv("SCHEDULER_ENABLED", "true").lower() == "true":
+            self.scheduler.start()
+        self.backfill.start()
+        self.outbox.start()
+        self.init_queue.start()
+        self.live_poller.start()
+
+    async def _ensure_indexes(self):
+        """Create indexes, retrying with backoff until they all exist"""
+        delay = self.index_retry_seconds
+        while True:
+            try:
+                await self.db.ensure_indexes()
+                return
+            except Exception as e:
+                logging.error(f"Failed to ensure indexes, background workers wait: {str(e)}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 300)
+
+
+def get_services(request: Request) -> Services:
+    """FastAPI dependency returning the container the lifespan started"""
+    return request.app.state.services
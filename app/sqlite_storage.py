@@ -0,0 +1,665 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from bson.objectid import ObjectId
+import asyncio
+import functools
+import json
+import logging
+import sqlite3
+from .change_detector import StoredState, fingerprint
+from .storage import Storage, new_watch_document
+from .utils import section_to_dict
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS watches (
+    id TEXT PRIMARY KEY,
+    subject TEXT,
+    course_number TEXT,
+    crns TEXT NOT NULL,
+    email TEXT NOT NULL,
+    term TEXT NOT NULL,
+    status TEXT NOT NULL,
+    section_crns TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    init_claimed_by TEXT,
+    init_claimed_until TEXT
+);
+CREATE INDEX IF NOT EXISTS watches_email ON watches (email, id);
+CREATE INDEX IF NOT EXISTS watches_status ON watches (status, id);
+-- The CRNs each watch asked for, for the crn filter of list_watches
+CREATE TABLE IF NOT EXISTS watch_crns (
+    crn TEXT NOT NULL,
+    watch_id TEXT NOT NULL,
+    PRIMARY KEY (crn, watch_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS watch_sections (
+    watch_id TEXT NOT NULL,
+    term TEXT NOT NULL,
+    crn TEXT NOT NULL,
+    PRIMARY KEY (watch_id, crn)
+);
+CREATE INDEX IF NOT EXISTS watch_sections_crn ON watch_sections (term, crn);
+CREATE TABLE IF NOT EXISTS sections (
+    term TEXT NOT NULL,
+    crn TEXT NOT NULL,
+    section TEXT NOT NULL,
+    fingerprint TEXT,
+    version INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT NOT NULL,
+    created_at TEXT,
+    PRIMARY KEY (term, crn)
+);
+CREATE INDEX IF NOT EXISTS sections_updated ON sections (updated_at);
+-- Clustered per section; the version dedupes a transition recorded twice
+CREATE TABLE IF NOT EXISTS section_history (
+    term TEXT NOT NULL,
+    crn TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    at TEXT NOT NULL,
+    from_status TEXT,
+    to_status TEXT,
+    PRIMARY KEY (term, crn, version)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS status (
+    name TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outbox (
+    id TEXT PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TEXT NOT NULL,
+    claimed_by TEXT,
+    claimed_until TEXT,
+    last_error TEXT,
+    created_at TEXT NOT NULL,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at);
+"""
+
+# Fixed width so stored timestamps compare correctly as strings
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+# Stay well under SQLite's bound-parameter limit
+MAX_PARAMETERS = 500
+
+
+def _ts(value):
+    return value.strftime(TIMESTAMP_FORMAT) if value else None
+
+
+def _dt(value):
+    return datetime.strptime(value, TIMESTAMP_FORMAT) if value else None
+
+
+def _chunks(items, size=MAX_PARAMETERS):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _placeholders(items):
+    return ",".join("?" * len(items))
+
+
+def _on_connection_thread(method):
+    """Run a blocking storage method on the connection's thread instead of the event loop"""
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(method, self, *args, **kwargs)
+        )
+    return wrapper
+
+
+class SqliteStorage(Storage):
+    """Single-file SQLite backend for small deployments and local benchmarking
+
+    Every call runs on one thread of its own, in order. Workers sharing the
+    file wait on each other's write locks for up to the busy timeout, which
+    would otherwise stall the event loop and every request on it.
+    """
+
+    def __init__(self, path="class_tracking.db"):
+        self.path = path
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        tables = {row["name"] for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self.conn.executescript(SCHEMA)
+        if "watches" in tables and "watch_crns" not in tables:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO watch_crns (crn, watch_id) "
+                "SELECT json_each.value, watches.id FROM watches, json_each(watches.crns)"
+            )
+        if "created_at" not in {row["name"] for row in self.conn.execute("PRAGMA table_info(sections)")}:
+            # A section stored before created_at has been tracked at least since its last write
+            self.conn.execute("ALTER TABLE sections ADD COLUMN created_at TEXT")
+            self.conn.execute("UPDATE sections SET created_at = updated_at")
+        logging.info(f"Using SQLite storage at {path}")
+
+    @contextmanager
+    def _transaction(self):
+        # IMMEDIATE takes the write lock up front so claims are atomic across workers
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conn
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    @_on_connection_thread
+    def ping(self):
+        self.conn.execute("SELECT 1")
+
+    async def close(self):
+        await asyncio.get_running_loop().run_in_executor(self._executor, self.conn.close)
+        self._executor.shutdown()
+
+    # Watches
+
+    def _watch(self, row):
+        watch = {
+            "_id": ObjectId(row["id"]),
+            "subject": row["subject"],
+            "course_number": row["course_number"],
+            "crns": json.loads(row["crns"]),
+            "email": row["email"],
+            "term": row["term"],
+            "status": row["status"],
+            "created_at": _dt(row["created_at"]),
+            "updated_at": _dt(row["updated_at"])
+        }
+        if row["section_crns"] is not None:
+            watch["section_crns"] = json.loads(row["section_crns"])
+        return watch
+
+    def _attach_course_info(self, watches):
+        by_term = {}
+        for watch in watches:
+            if "section_crns" in watch:
+                by_term.setdefault(watch["term"], set()).update(watch["section_crns"])
+
+        sections = {}
+        for term, crns in by_term.items():
+            for chunk in _chunks(crns):
+                rows = self.conn.execute(
+                    f"SELECT crn, section FROM sections WHERE term = ? AND crn IN ({_placeholders(chunk)})",
+                    [term, *chunk]
+                )
+                sections.update(((term, row["crn"]), json.loads(row["section"])) for row in rows)
+
+        for watch in watches:
+            if "section_crns" in watch:
+                watch["course_info"] = [
+                    sections[(watch["term"], crn)]
+                    for crn in watch["section_crns"]
+                    if (watch["term"], crn) in sections
+                ]
+        return watches
+
+    @_on_connection_thread
+    def get_all_watches(self):
+        try:
+            rows = self.conn.execute("SELECT * FROM watches ORDER BY id")
+            return self._attach_course_info([self._watch(row) for row in rows])
+        except Exception as e:
+            logging.error(f"Failed to get watches: {str(e)}")
+            return []
+
+    @_on_connection_thread
+    def list_watches(self, email=None, status=None, crn=None, after=None, limit=50, fields=None):
+        clauses = []
+        params = []
+        if email:
+            clauses.append("email = ?")
+            params.append(email)
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if crn:
+            clauses.append("id IN (SELECT watch_id FROM watch_crns WHERE crn = ?)")
+            params.append(crn)
+        if after:
+            clauses.append("id > ?")
+            params.append(str(ObjectId(after)))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        rows = self.conn.execute(f"SELECT * FROM watches {where} ORDER BY id LIMIT ?", [*params, limit + 1])
+        watches = [self._watch(row) for row in rows]
+        next_cursor = str(watches[limit - 1]["_id"]) if len(watches) > limit else None
+        watches = watches[:limit]
+        if not fields or "course_info" in fields:
+            self._attach_course_info(watches)
+        if fields:
+            keep = set(fields) | {"_id"}
+            watches = [{k: v for k, v in watch.items() if k in keep} for watch in watches]
+        return watches, next_cursor
+
+    def _insert_watches(self, documents):
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT INTO watches (id, subject, course_number, crns, email, term, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        str(doc["_id"]), doc["subject"], doc["course_number"], json.dumps(doc["crns"]),
+                        doc["email"], doc["term"], doc["status"], _ts(doc["created_at"]), _ts(doc["updated_at"])
+                    )
+                    for doc in documents
+                ]
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO watch_crns (crn, watch_id) VALUES (?, ?)",
+                [(crn, str(doc["_id"])) for doc in documents for crn in doc["crns"]]
+            )
+        return [doc["_id"] for doc in documents]
+
+    @_on_connection_thread
+    def add_watch_minimal(self, subject, course_number, crns, email):
+        try:
+            document = new_watch_document(subject, course_number, crns, email, datetime.utcnow())
+            document["_id"] = ObjectId()
+            return self._insert_watches([document])[0]
+
+        except Exception as e:
+            logging.error(f"Failed to add watch: {str(e)}")
+            raise
+
+    @_on_connection_thread
+    def add_watches_bulk(self, watches):
+        try:
+            now = datetime.utcnow()
+            documents = []
+            for watch in watches:
+                document = new_watch_document(watch.subject, watch.course_number, watch.crns or [], watch.email, now)
+                document["_id"] = ObjectId()
+                documents.append(document)
+            return self._insert_watches(documents)
+
+        except Exception as e:
+            logging.error(f"Failed to add watches: {str(e)}")
+            raise
+
+    @_on_connection_thread
+    def update_watch_status(self, watch_id, status):
+        try:
+            cursor = self.conn.execute(
+                "UPDATE watches SET status = ?, updated_at = ? WHERE id = ? AND status != ?",
+                (status, _ts(datetime.utcnow()), str(watch_id), status)
+            )
+            return cursor.rowcount > 0
+
+        except Exception as e:
+            logging.error(f"Failed to update watch status: {str(e)}")
+            return False
+
+    @_on_connection_thread
+    def get_watch_by_id(self, watch_id):
+        try:
+            row = self.conn.execute("SELECT * FROM watches WHERE id = ?", (str(watch_id),)).fetchone()
+            return self._attach_course_info([self._watch(row)])[0] if row else None
+
+        except Exception as e:
+            logging.error(f"Failed to get watch: {str(e)}")
+            return None
+
+    @_on_connection_thread
+    def delete_watch(self, watch_id):
+        try:
+            with self._transaction() as conn:
+                conn.execute("DELETE FROM watch_sections WHERE watch_id = ?", (str(watch_id),))
+                conn.execute("DELETE FROM watch_crns WHERE watch_id = ?", (str(watch_id),))
+                cursor = conn.execute("DELETE FROM watches WHERE id = ?", (str(watch_id),))
+            return cursor.rowcount > 0
+
+        except Exception as e:
+            logging.error(f"Failed to delete watch: {str(e)}")
+            return False
+
+    def _link(self, conn, watch_id, crns, now):
+        watch_id = str(watch_id)
+        row = conn.execute("SELECT term FROM watches WHERE id = ?", (watch_id,)).fetchone()
+        if row is None:
+            return False
+        conn.execute(
+            "UPDATE watches SET section_crns = ?, updated_at = ? WHERE id = ?",
+            (json.dumps(list(crns)), _ts(now), watch_id)
+        )
+        conn.execute("DELETE FROM watch_sections WHERE watch_id = ?", (watch_id,))
+        conn.executemany(
+            "INSERT OR IGNORE INTO watch_sections (watch_id, term, crn) VALUES (?, ?, ?)",
+            [(watch_id, row["term"], crn) for crn in crns]
+        )
+        return True
+
+    @_on_connection_thread
+    def link_watch_sections(self, watch_id, crns):
+        try:
+            with self._transaction() as conn:
+                return self._link(conn, watch_id, crns, datetime.utcnow())
+
+        except Exception as e:
+            logging.error(f"Failed to link watch sections: {str(e)}")
+            return False
+
+    @_on_connection_thread
+    def link_watches(self, links):
+        if not links:
+            return
+        now = datetime.utcnow()
+        with self._transaction() as conn:
+            for watch_id, crns in links:
+                self._link(conn, watch_id, crns, now)
+
+    @_on_connection_thread
+    def get_watchers(self, term, crns):
+        try:
+            watches = {}
+            for chunk in _chunks(crns):
+                rows = self.conn.execute(
+                    "SELECT w.* FROM watch_sections ws JOIN watches w ON w.id = ws.watch_id "
+                    f"WHERE ws.term = ? AND ws.crn IN ({_placeholders(chunk)})",
+                    [term, *chunk]
+                )
+                watches.update((row["id"], self._watch(row)) for row in rows)
+            return self._attach_course_info([watches[watch_id] for watch_id in sorted(watches)])
+
+        except Exception as e:
+            logging.error(f"Failed to get watchers: {str(e)}")
+            raise
+
+    # Sections
+
+    def _write_sections(self, rows, overwrite=True):
+        # created_at is only ever set by the insert
+        conflict = (
+            "DO UPDATE SET section = excluded.section, fingerprint = excluded.fingerprint, "
+            "version = excluded.version, updated_at = excluded.updated_at"
+        ) if overwrite else "DO NOTHING"
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT INTO sections (term, crn, section, fingerprint, version, updated_at, created_at) "
+                f"VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (term, crn) {conflict}",
+                [(*row, row[-1]) for row in rows]
+            )
+
+    @_on_connection_thread
+    def upsert_sections(self, term, sections, overwrite=True):
+        if not sections:
+            return
+        now = _ts(datetime.utcnow())
+        self._write_sections(
+            [
+                (term, s["CRN"], json.dumps(section_to_dict(s)), fingerprint(s), 0, now)
+                for s in sections
+            ],
+            overwrite
+        )
+
+    @_on_connection_thread
+    def apply_change_set(self, change_set):
+        if not change_set.upserts:
+            return
+        now = _ts(datetime.utcnow())
+        self._write_sections([
+            (term, section["CRN"], json.dumps(section_to_dict(section)), fp, version, now)
+            for term, section, fp, version in change_set.upserts
+        ])
+
+    @_on_connection_thread
+    def get_section_states(self, keys):
+        by_term = {}
+        for term, crn in keys:
+            by_term.setdefault(term, []).append(crn)
+
+        states = {}
+        for term, crns in by_term.items():
+            for chunk in _chunks(crns):
+                rows = self.conn.execute(
+                    "SELECT crn, fingerprint, version, json_extract(section, '$.Status') AS status "
+                    f"FROM sections WHERE term = ? AND crn IN ({_placeholders(chunk)})",
+                    [term, *chunk]
+                )
+                states.update(
+                    ((term, row["crn"]), StoredState(row["fingerprint"], row["status"], row["version"]))
+                    for row in rows
+                )
+        return states
+
+    @_on_connection_thread
+    def get_section_record(self, term, crn):
+        row = self.conn.execute(
+            "SELECT term, crn, section, version, created_at, updated_at FROM sections WHERE term = ? AND crn = ?",
+            (term, crn)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "term": row["term"],
+            "crn": row["crn"],
+            "section": json.loads(row["section"]),
+            "version": row["version"],
+            "created_at": _dt(row["created_at"]),
+            "updated_at": _dt(row["updated_at"])
+        }
+
+    @_on_connection_thread
+    def get_sections_updated_since(self, since):
+        rows = self.conn.execute(
+            "SELECT term, crn, section, version, updated_at FROM sections WHERE updated_at > ?",
+            (_ts(since),)
+        )
+        return [
+            {
+                "term": row["term"],
+                "crn": row["crn"],
+                "section": json.loads(row["section"]),
+                "version": row["version"],
+                "updated_at": _dt(row["updated_at"])
+            }
+            for row in rows
+        ]
+
+    # Section history
+
+    @_on_connection_thread
+    def record_transitions(self, transitions):
+        if not transitions:
+            return
+        now = _ts(datetime.utcnow())
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO section_history (term, crn, version, at, from_status, to_status) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (change.term, change.section["CRN"], change.version, now, change.old_status, change.section["Status"])
+                    for change in transitions
+                ]
+            )
+
+    @_on_connection_thread
+    def get_section_history(self, term, crn, since=None, until=None):
+        where = "term = ? AND crn = ?"
+        params = [term, crn]
+        if since:
+            where += " AND at >= ?"
+            params.append(_ts(since))
+        if until:
+            where += " AND at < ?"
+            params.append(_ts(until))
+        rows = self.conn.execute(
+            f"SELECT at, from_status, to_status, version FROM section_history WHERE {where} ORDER BY version",
+            params
+        )
+        return [
+            {"at": _dt(row["at"]), "from": row["from_status"], "to": row["to_status"], "version": row["version"]}
+            for row in rows
+        ]
+
+    # Leases
+
+    @_on_connection_thread
+    def acquire_lease(self, name, owner, ttl_seconds):
+        try:
+            now = datetime.utcnow()
+            with self._transaction() as conn:
+                conn.execute(
+                    "INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                    "WHERE leases.owner = excluded.owner OR leases.expires_at < ?",
+                    (name, owner, _ts(now + timedelta(seconds=ttl_seconds)), _ts(now))
+                )
+                row = conn.execute("SELECT owner FROM leases WHERE name = ?", (name,)).fetchone()
+            return row is not None and row["owner"] == owner
+
+        except Exception as e:
+            logging.error(f"Failed to acquire lease {name}: {str(e)}")
+            return False
+
+    @_on_connection_thread
+    def release_lease(self, name, owner):
+        try:
+            cursor = self.conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+            return cursor.rowcount > 0
+
+        except Exception as e:
+            logging.error(f"Failed to release lease {name}: {str(e)}")
+            return False
+
+    # Shared status
+
+    @_on_connection_thread
+    def put_status(self, name, fields):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO status (name, payload, updated_at) VALUES (?, ?, ?)",
+            (name, json.dumps(fields), _ts(datetime.utcnow()))
+        )
+
+    @_on_connection_thread
+    def get_status(self, name):
+        row = self.conn.execute("SELECT payload, updated_at FROM status WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        return {**json.loads(row["payload"]), "updated_at": _dt(row["updated_at"])}
+
+    # Outbox
+
+    @_on_connection_thread
+    def enqueue_emails(self, messages):
+        if not messages:
+            return 0
+        now = _ts(datetime.utcnow())
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO outbox (id, key, payload, status, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, 'pending', ?, ?)",
+                [
+                    (
+                        str(ObjectId()), message["key"],
+                        json.dumps({k: v for k, v in message.items() if k != "key"}), now, now
+                    )
+                    for message in messages
+                ]
+            )
+            return conn.total_changes - before
+
+    @_on_connection_thread
+    def claim_email(self, owner, lease_seconds):
+        now = datetime.utcnow()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT * FROM outbox WHERE (status = 'pending' AND next_attempt_at <= ?) "
+                "OR (status = 'sending' AND claimed_until < ?) ORDER BY next_attempt_at LIMIT 1",
+                (_ts(now), _ts(now))
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE outbox SET status = 'sending', claimed_by = ?, claimed_until = ? WHERE id = ?",
+                (owner, _ts(now + timedelta(seconds=lease_seconds)), row["id"])
+            )
+        return {
+            **json.loads(row["payload"]),
+            "_id": row["id"],
+            "key": row["key"],
+            "attempts": row["attempts"]
+        }
+
+    @_on_connection_thread
+    def mark_email_sent(self, email_id):
+        self.conn.execute(
+            "UPDATE outbox SET status = 'sent', finished_at = ? WHERE id = ?",
+            (_ts(datetime.utcnow()), email_id)
+        )
+
+    @_on_connection_thread
+    def retry_email(self, email_id, attempts, next_attempt_at, error):
+        self.conn.execute(
+            "UPDATE outbox SET status = 'pending', attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+            (attempts, _ts(next_attempt_at), error, email_id)
+        )
+
+    @_on_connection_thread
+    def dead_letter_email(self, email_id, attempts, error):
+        self.conn.execute(
+            "UPDATE outbox SET status = 'dead', attempts = ?, last_error = ?, finished_at = ? WHERE id = ?",
+            (attempts, error, _ts(datetime.utcnow()), email_id)
+        )
+
+    # Initialization queue
+
+    @_on_connection_thread
+    def claim_initializing_watches(self, owner, limit, claim_seconds):
+        now = datetime.utcnow()
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT * FROM watches WHERE status = 'initializing' "
+                "AND (init_claimed_until IS NULL OR init_claimed_until < ?) ORDER BY id LIMIT ?",
+                (_ts(now), limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE watches SET init_claimed_by = ?, init_claimed_until = ? WHERE id = ?",
+                [(owner, _ts(now + timedelta(seconds=claim_seconds)), row["id"]) for row in rows]
+            )
+        return [self._watch(row) for row in rows]
+
+    @_on_connection_thread
+    def finish_initialization(self, active, failed):
+        now = datetime.utcnow()
+        with self._transaction() as conn:
+            for watch_id, crns in active:
+                if self._link(conn, watch_id, crns, now):
+                    conn.execute(
+                        "UPDATE watches SET status = 'active', init_claimed_by = NULL, init_claimed_until = NULL "
+                        "WHERE id = ?",
+                        (str(watch_id),)
+                    )
+            conn.executemany(
+                "UPDATE watches SET status = 'failed', updated_at = ?, init_claimed_by = NULL, "
+                "init_claimed_until = NULL WHERE id = ?",
+                [(_ts(now), str(watch_id)) for watch_id in failed]
+            )
+
+    @_on_connection_thread
+    def queue_depths(self):
+        return {
+            "outbox": self.conn.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()[0],
+            "initializing": self.conn.execute(
+                "SELECT COUNT(*) FROM watches WHERE status = 'initializing'"
+            ).fetchone()[0]
+        }
@@ -0,0 +1,207 @@
+from abc import ABC, abstractmethod
+import inspect
+import os
+import logging
+from .metrics import STORAGE_ERRORS, STORAGE_SECONDS, timed
+from .utils import DEFAULT_TERM
+
+
+def new_watch_document(subject, course_number, crns, email, now):
+    """The document every backend stores for a newly added watch"""
+    return {
+        "subject": subject,
+        "course_number": course_number,
+        "crns": crns,
+        "email": email,
+        "term": DEFAULT_TERM,
+        "status": "initializing",
+        "created_at": now,
+        "updated_at": now
+    }
+
+
+class Storage(ABC):
+    """Persistence interface shared by the Mongo, in-memory and SQLite backends
+
+    Watches, outbox emails and leases are plain dicts with an ObjectId `_id`,
+    whichever backend stores them.
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Time every public operation a backend defines, labelled with the backend
+        for name, attr in list(vars(cls).items()):
+            if not name.startswith("_") and inspect.iscoroutinefunction(attr):
+                setattr(cls, name, timed(STORAGE_SECONDS, cls.__name__, name, errors=STORAGE_ERRORS)(attr))
+
+    async def ping(self):
+        """Raise if the backend can't serve requests"""
+
+    async def ensure_indexes(self):
+        """Create indexes and backfill fields older records lack"""
+
+    async def close(self):
+        """Release connections or file handles"""
+
+    # Watches
+
+    @abstractmethod
+    async def get_all_watches(self):
+        """Get every watch with course_info attached"""
+
+    @abstractmethod
+    async def list_watches(self, email=None, status=None, crn=None, after=None, limit=50, fields=None):
+        """Get one page of watches in _id order. Returns (watches, cursor of the next page or None)"""
+
+    @abstractmethod
+    async def add_watch_minimal(self, subject, course_number, crns, email):
+        """Add a new watch with minimal information"""
+
+    @abstractmethod
+    async def add_watches_bulk(self, watches):
+        """Add many CourseWatch models as initializing watches; returns their ids"""
+
+    @abstractmethod
+    async def update_watch_status(self, watch_id, status):
+        """Update the status of a watch"""
+
+    @abstractmethod
+    async def get_watch_by_id(self, watch_id):
+        """Get a watch by its ID"""
+
+    @abstractmethod
+    async def delete_watch(self, watch_id):
+        """Delete a watch by its ID"""
+
+    @abstractmethod
+    async def link_watch_sections(self, watch_id, crns):
+        """Set the CRNs a watch references"""
+
+    @abstractmethod
+    async def link_watches(self, links):
+        """Bulk version of link_watch_sections for (watch_id, crns) pairs"""
+
+    @abstractmethod
+    async def get_watchers(self, term, crns):
+        """Get the watches referencing any of the CRNs
+
+        Raises on failure: the check cycle must not persist transitions it
+        couldn't find the watchers of.
+        """
+
+    async def update_course_info(self, watch_id, sections, term=DEFAULT_TERM):
+        """Store the sections of a watch and point the watch at their CRNs"""
+        try:
+            await self.upsert_sections(term, sections, overwrite=False)
+            return await self.link_watch_sections(watch_id, [s['CRN'] for s in sections])
+
+        except Exception as e:
+            logging.error(f"Failed to update course info: {str(e)}")
+            return False
+
+    # Sections
+
+    @abstractmethod
+    async def upsert_sections(self, term, sections, overwrite=True):
+        """Write sections; with overwrite=False only ones not stored yet"""
+
+    @abstractmethod
+    async def apply_change_set(self, change_set):
+        """Persist every changed section of a cycle in one batch"""
+
+    @abstractmethod
+    async def get_section_states(self, keys):
+        """Get the stored StoredState for (term, CRN) pairs"""
+
+    @abstractmethod
+    async def get_section_record(self, term, crn):
+        """Get {"term", "crn", "section", "version", "created_at", "updated_at"} for one section, or None"""
+
+    @abstractmethod
+    async def get_sections_updated_since(self, since):
+        """Get {"term", "crn", "section", "version", "updated_at"} for sections written after `since`"""
+
+    # Section history
+
+    @abstractmethod
+    async def record_transitions(self, transitions):
+        """Append SectionChanges to the per-section status history, stamped now"""
+
+    @abstractmethod
+    async def get_section_history(self, term, crn, since=None, until=None):
+        """Get one section's transitions in time order, as {"at", "from", "to", "version"} dicts
+
+        A transition recorded twice (a cycle that died before persisting) keeps
+        its first entry; (term, CRN, version) identifies it.
+        """
+
+    # Leases
+
+    @abstractmethod
+    async def acquire_lease(self, name, owner, ttl_seconds):
+        """Take or renew a named lease. Returns True if `owner` holds it afterwards"""
+
+    @abstractmethod
+    async def release_lease(self, name, owner):
+        """Give up a lease held by `owner`"""
+
+    # Shared status
+
+    @abstractmethod
+    async def put_status(self, name, fields):
+        """Store a small status document other workers read, stamped with updated_at"""
+
+    @abstractmethod
+    async def get_status(self, name):
+        """Get a status document with its updated_at, or None"""
+
+    # Outbox
+
+    @abstractmethod
+    async def enqueue_emails(self, messages):
+        """Add emails to the outbox, skipping idempotency keys already there"""
+
+    @abstractmethod
+    async def claim_email(self, owner, lease_seconds):
+        """Claim the next due outbox email, or return None"""
+
+    @abstractmethod
+    async def mark_email_sent(self, email_id):
+        """Record a delivered email"""
+
+    @abstractmethod
+    async def retry_email(self, email_id, attempts, next_attempt_at, error):
+        """Put a failed email back in the queue for a later attempt"""
+
+    @abstractmethod
+    async def dead_letter_email(self, email_id, attempts, error):
+        """Park an email that kept failing"""
+
+    # Initialization queue
+
+    @abstractmethod
+    async def claim_initializing_watches(self, owner, limit, claim_seconds):
+        """Claim up to `limit` watches still initializing"""
+
+    @abstractmethod
+    async def finish_initialization(self, active, failed):
+        """Mark (watch_id, crns) pairs active and failed watch ids failed"""
+
+    @abstractmethod
+    async def queue_depths(self):
+        """Count pending outbox emails and initializing watches, keyed by queue name"""
+
+
+def create_storage() -> Storage:
+    """Build the backend named by STORAGE_BACKEND: mongo (default), memory or sqlite"""
+    backend = os.getenv("STORAGE_BACKEND", "mongo").lower()
+    if backend == "memory":
+        from .memory_storage import MemoryStorage
+        return MemoryStorage()
+    if backend == "sqlite":
+        from .sqlite_storage import SqliteStorage
+        return SqliteStorage(os.getenv("SQLITE_PATH", "class_tracking.db"))
+    if backend == "mongo":
+        from .database import Database
+        return Database()
+    raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}")
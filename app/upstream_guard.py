@@ -0,0 +1,256 @@
+from typing import Deque, List, Optional
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime
+import os
+import time
+import asyncio
+import logging
+from .check_engine import TokenBucket
+from .metrics import HOWDY_CIRCUIT_STATE, HOWDY_CONCURRENCY_LIMIT, HOWDY_REJECTED
+
+
+class UpstreamDegraded(Exception):
+    """Howdy is failing or the circuit is open; callers keep serving their last known state"""
+
+
+class CircuitBreaker:
+    """Opens after too many failed or slow calls in a rolling window, then probes with one call
+
+    closed -> open once `failure_ratio` of the last `window` calls failed (with at
+    least `min_calls` recorded); open -> half_open after `cooldown` seconds;
+    half_open -> closed if the probe succeeds, back to open if it fails.
+    """
+
+    def __init__(self, window: int, min_calls: int, failure_ratio: float, cooldown: float):
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.cooldown = cooldown
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.probing = False
+
+    def before_call(self):
+        """Raise UpstreamDegraded unless a call may go out now"""
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.cooldown:
+                raise UpstreamDegraded("Howdy circuit open, serving last known state")
+            self._set_state("half_open")
+        if self.state == "half_open":
+            if self.probing:
+                raise UpstreamDegraded("Howdy circuit half-open, waiting on a probe")
+            self.probing = True
+
+    def record(self, ok: bool):
+        if self.state == "half_open":
+            self.probing = False
+            if ok:
+                self.outcomes.clear()
+                self._set_state("closed")
+            else:
+                self._open()
+            return
+
+        self.outcomes.append(ok)
+        failures = self.outcomes.count(False)
+        if len(self.outcomes) >= self.min_calls and failures >= self.failure_ratio * len(self.outcomes):
+            self._open()
+
+    def abandon(self):
+        """A call was cancelled before it told us anything"""
+        if self.state == "half_open":
+            self.probing = False
+
+    def _open(self):
+        self.opened_at = time.monotonic()
+        self.outcomes.clear()
+        self._set_state("open")
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            logging.warning(f"Howdy circuit {self.state} -> {state}")
+        self.state = state
+        HOWDY_CIRCUIT_STATE.set({"closed": 0, "half_open": 1, "open": 2}[state])
+
+
+class AdaptiveLimiter:
+    """In-flight request cap tuned by AIMD on observed latency
+
+    Each fast success adds 1/limit (about +1 per round of requests); a failure
+    or a response slower than `target_latency` halves the limit, at most once
+    per `target_latency` so one slow burst doesn't collapse it to the floor.
+    """
+
+    def __init__(self, initial: float, minimum: float, maximum: float, target_latency: float, backoff: float = 0.5):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = min(max(initial, minimum), maximum)
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.in_flight = 0
+        self.decreased_at = 0.0
+        self._waiters: List[asyncio.Future] = []
+        HOWDY_CONCURRENCY_LIMIT.set(self.limit)
+
+    async def acquire(self):
+        while self.in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            # Every release wakes every waiter, so a cancelled one can't swallow a slot
+            await waiter
+        self.in_flight += 1
+
+    def release(self, latency: Optional[float], ok: bool):
+        """Return a slot; latency None means the call was cancelled and says nothing"""
+        self.in_flight -= 1
+        if latency is not None:
+            now = time.monotonic()
+            if not ok or latency > self.target_latency:
+                if now - self.decreased_at >= self.target_latency:
+                    self.limit = max(self.minimum, self.limit * self.backoff)
+                    self.decreased_at = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            HOWDY_CONCURRENCY_LIMIT.set(self.limit)
+
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+
+class UpstreamGuard:
+    """Circuit breaker plus adaptive concurrency around each upstream request"""
+
+    def __init__(self, breaker: CircuitBreaker, limiter: AdaptiveLimiter, slow_seconds: float):
+        self.breaker = breaker
+        self.limiter = limiter
+        # Calls slower than this count against the breaker even if they succeed
+        self.slow_seconds = slow_seconds
+
+    @property
+    def degraded(self) -> bool:
+        return self.breaker.state != "closed"
+
+    @asynccontextmanager
+    async def call(self, rate_limiter: Optional[TokenBucket] = None):
+        """Admit one request; failures inside the block surface as UpstreamDegraded
+
+        The breaker is checked before waiting on `rate_limiter`, so an open
+        circuit fails fast instead of queueing for tokens first.
+        """
+        try:
+            self.breaker.before_call()
+        except UpstreamDegraded:
+            HOWDY_REJECTED.inc()
+            raise
+        try:
+            await self.limiter.acquire()
+        except BaseException:
+            self.breaker.abandon()
+            raise
+        try:
+            if rate_limiter:
+                await rate_limiter.acquire()
+        except BaseException:
+            self.limiter.release(None, False)
+            self.breaker.abandon()
+            raise
+
+        start = time.monotonic()
+        latency = None
+        ok = False
+        try:
+            yield
+            ok = True
+        except asyncio.CancelledError:
+            self.breaker.abandon()
+            raise
+        except UpstreamDegraded:
+            raise
+        except Exception as e:
+            latency = time.monotonic() - start
+            raise UpstreamDegraded(f"Howdy request failed: {e!r}") from e
+        finally:
+            if ok:
+                latency = time.monotonic() - start
+            self.limiter.release(latency, ok)
+            if latency is not None:
+                self.breaker.record(ok and latency <= self.slow_seconds)
+
+
+class SharedHealth:
+    """The guard's verdict on Howdy, shared from the worker polling it with every other worker
+
+    Only the lease holder calls Howdy, so the other workers' own breakers
+    never open. The poller stores its state when it changes, and at least
+    every `heartbeat` seconds. Readers also count a record older than
+    `stale_after` as degraded, since then nobody is checking Howdy.
+    """
+
+    NAME = "howdy"
+
+    def __init__(self, db, guard: UpstreamGuard, heartbeat: Optional[float] = None,
+                 stale_after: Optional[float] = None, cache_seconds: Optional[float] = None):
+        self.db = db
+        self.guard = guard
+        self.heartbeat = heartbeat or float(os.getenv("HOWDY_HEALTH_HEARTBEAT_SECONDS", "30"))
+        self.stale_after = stale_after or float(os.getenv("HOWDY_HEALTH_STALE_SECONDS", "120"))
+        self.cache_seconds = cache_seconds if cache_seconds is not None else float(os.getenv("HOWDY_HEALTH_CACHE_SECONDS", "5"))
+        self._published: Optional[bool] = None
+        self._published_at = 0.0
+        self._cached: Optional[bool] = None
+        self._cached_at = 0.0
+
+    async def publish(self):
+        """Store this worker's view of Howdy; called by the poller after every cycle"""
+        degraded = self.guard.degraded
+        now = time.monotonic()
+        if degraded == self._published and now - self._published_at < self.heartbeat:
+            return
+        try:
+            await self.db.put_status(self.NAME, {"degraded": degraded})
+            self._published = degraded
+            self._published_at = now
+        except Exception as e:
+            logging.error(f"Failed to publish Howdy health: {str(e)}")
+
+    async def degraded(self) -> bool:
+        """True if this worker's guard or the poller's stored state says Howdy is degraded"""
+        if self.guard.degraded:
+            return True
+        now = time.monotonic()
+        if self._cached is None or now - self._cached_at >= self.cache_seconds:
+            try:
+                status = await self.db.get_status(self.NAME)
+            except Exception as e:
+                logging.error(f"Failed to read Howdy health: {str(e)}")
+                return False
+            self._cached = bool(status) and (
+                status.get("degraded", False)
+                or (datetime.utcnow() - status["updated_at"]).total_seconds() > self.stale_after
+            )
+            self._cached_at = now
+        return self._cached
+
+
+def howdy_guard() -> UpstreamGuard:
+    """Guard for Howdy requests, configured by the HOWDY_BREAKER_* and HOWDY_*_CONCURRENCY settings"""
+    max_concurrency = float(os.getenv("HOWDY_MAX_CONCURRENCY", os.getenv("HOWDY_CONNECTIONS_PER_HOST", "8")))
+    return UpstreamGuard(
+        CircuitBreaker(
+            window=int(os.getenv("HOWDY_BREAKER_WINDOW", "20")),
+            min_calls=int(os.getenv("HOWDY_BREAKER_MIN_CALLS", "5")),
+            failure_ratio=float(os.getenv("HOWDY_BREAKER_FAILURE_RATIO", "0.5")),
+            cooldown=float(os.getenv("HOWDY_BREAKER_COOLDOWN_SECONDS", "30"))
+        ),
+        AdaptiveLimiter(
+            initial=float(os.getenv("HOWDY_INITIAL_CONCURRENCY", "4")),
+            minimum=float(os.getenv("HOWDY_MIN_CONCURRENCY", "1")),
+            maximum=max_concurrency,
+            target_latency=float(os.getenv("HOWDY_TARGET_LATENCY_SECONDS", "1.5"))
+        ),
+        slow_seconds=float(os.getenv("HOWDY_SLOW_SECONDS", "4"))
+    )
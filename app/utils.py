@@ -1,11 +1,12 @@
 from pydantic import BaseModel
 from typing import List, Dict, Optional
-import requests
+import csv
+import io
 import json
 import re
-import aiohttp
-import asyncio
-import logging
+from functools import lru_cache
+
+DEFAULT_TERM = "202511"
 
 class CourseWatch(BaseModel):
     subject: Optional[str] = None
@@ -15,80 +16,160 @@ class CourseWatch(BaseModel):
     last_status: dict = {}  # Stores the last known status of sections
 
 
-# Your existing get_course_sections function goes here, but make it async
-async def get_course_sections(subject: Optional[str] = None, course_number: Optional[str] = None, crns: Optional[List[str]] = None, term: str = "202511") -> List[Dict]:
-    try:
-        # Reduce timeout to fail fast
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                "https://howdy.tamu.edu/api/course-sections",
-                headers={
-                    "User-Agent": "Mozilla/5.0",
-                    "Accept": "application/json",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "startRow": 0,
-                    "endRow": 50,
-                    "termCode": term,
-                    "publicSearch": "Y",
-                    **({"subject": subject, "courseNumber": str(course_number)} if subject and course_number else {})
-                },
-                timeout=aiohttp.ClientTimeout(total=5)  # Reduced timeout
-            ) as response:
-                if response.status != 200:
-                    return []
-                    
-                courses = await response.json()
-                
-                # Optimize filtering
-                if crns:
-                    crn_set = set(crns)  # Convert to set for O(1) lookup
-                    filtered_courses = [c for c in courses if c["SWV_CLASS_SEARCH_CRN"] in crn_set]
-                elif subject and course_number:
-                    filtered_courses = [
-                        c for c in courses 
-                        if c["SWV_CLASS_SEARCH_SUBJECT"] == subject and 
-                           c["SWV_CLASS_SEARCH_COURSE"] == str(course_number)
-                    ]
-                else:
-                    return []
-
-                # Process courses concurrently
-                tasks = [format_course(course) for course in filtered_courses]
-                formatted_courses = await asyncio.gather(*tasks)
-                return [c for c in formatted_courses if c]  # Filter out None values
-                
-    except asyncio.TimeoutError:
-        print("Request timed out")
-        return []
-    except Exception as e:
-        print(f"Error fetching course sections: {e}")
+def _split_crns(value) -> List[str]:
+    if isinstance(value, list):
+        return [str(crn).strip() for crn in value if str(crn).strip()]
+    return [crn for crn in re.split(r"[\s,;]+", str(value or "")) if crn]
+
+
+def _row_text(row: Dict, field: str) -> Optional[str]:
+    """A row's field as stripped text (numbers included), None if empty"""
+    value = row.get(field)
+    if isinstance(value, (dict, list, bool)):
+        raise ValueError(f"{field} must be text")
+    return (str(value).strip() or None) if value is not None else None
+
+
+def parse_watch_rows(body: bytes, content_type: str):
+    """Parse a bulk import body (JSON list or CSV with a header row) into CourseWatch models
+
+    Returns (watches, errors) where errors are {"row": index, "error": message} dicts.
+    """
+    if "csv" in content_type:
+        rows = list(csv.DictReader(io.StringIO(body.decode("utf-8-sig"))))
+    else:
+        rows = json.loads(body)
+        if isinstance(rows, dict):
+            rows = rows.get("watches", [])
+        if not isinstance(rows, list):
+            raise ValueError("Expected a list of watches")
+
+    watches = []
+    errors = []
+    for index, row in enumerate(rows):
+        try:
+            if not isinstance(row, dict):
+                raise ValueError("Row must be an object")
+            row = {key.strip(): value for key, value in row.items() if key}
+            watch = CourseWatch(
+                subject=_row_text(row, "subject"),
+                course_number=_row_text(row, "course_number"),
+                crns=_split_crns(row.get("crns")),
+                email=_row_text(row, "email") or ""
+            )
+            if not watch.email:
+                raise ValueError("Email is required")
+            if not watch.crns and not (watch.subject and watch.course_number):
+                raise ValueError("Must provide either CRNs or both Subject and Course Number")
+            watches.append(watch)
+        except Exception as e:
+            errors.append({"row": index, "error": str(e)})
+    return watches, errors
+
+
+class SectionIndex:
+    """In-memory view of a term snapshot, keyed by CRN and by (subject, course)"""
+
+    def __init__(self, term: str, sections: List["Section"]):
+        self.term = term
+        self.by_crn: Dict[str, "Section"] = {}
+        self.by_course: Dict[tuple, List["Section"]] = {}
+        for section in sections:
+            self.by_crn[section["CRN"]] = section
+            self.by_course.setdefault((section["Subject"], section["Course"]), []).append(section)
+
+    def __len__(self):
+        return len(self.by_crn)
+
+    def lookup(self, subject: Optional[str] = None, course_number: Optional[str] = None, crns: Optional[List[str]] = None) -> List["Section"]:
+        """Same filtering rules as get_course_sections, answered from the index"""
+        if crns:
+            if subject and course_number:
+                course = self.by_course.get((subject, str(course_number)), [])
+                crn_set = set(crns)
+                return [s for s in course if s["CRN"] in crn_set]
+            return [self.by_crn[crn] for crn in crns if crn in self.by_crn]
+        if subject and course_number:
+            return list(self.by_course.get((subject, str(course_number)), []))
         return []
 
-async def format_course(course):
+
+SECTION_FIELDS = ("CRN", "Subject", "Course", "Section", "Title", "Instructor", "Status", "Location")
+
+
+class Section:
+    """Compact section record. Supports section.CRN and section["CRN"] like the old dicts"""
+    __slots__ = SECTION_FIELDS
+
+    def __init__(self, CRN, Subject, Course, Section, Title, Instructor, Status, Location):
+        self.CRN = CRN
+        self.Subject = Subject
+        self.Course = Course
+        self.Section = Section
+        self.Title = Title
+        self.Instructor = Instructor
+        self.Status = Status
+        self.Location = Location
+
+    def __getitem__(self, key):
+        if key not in SECTION_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in SECTION_FIELDS else default
+
+    def _values(self):
+        return tuple(getattr(self, field) for field in SECTION_FIELDS)
+
+    def __eq__(self, other):
+        if isinstance(other, Section):
+            return self._values() == other._values()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self._values())
+
+    def __repr__(self):
+        return f"Section({self.Subject} {self.Course}-{self.Section}, CRN {self.CRN}, {self.Status})"
+
+    def to_dict(self) -> Dict:
+        """Plain dict for storage and JSON"""
+        return {field: getattr(self, field) for field in SECTION_FIELDS}
+
+
+def section_to_dict(section) -> Dict:
+    return section.to_dict() if isinstance(section, Section) else section
+
+
+@lru_cache(maxsize=4096)
+def _instructor_name(instructor_info: Optional[str]) -> str:
+    # Many sections share an instructor, so each distinct JSON string is parsed once
+    if instructor_info:
+        instructor_data = json.loads(instructor_info)
+        return instructor_data[0]["NAME"] if instructor_data else "No instructor assigned"
+    return "No instructor assigned"
+
+
+def format_course(course) -> Optional[Section]:
     try:
-        instructor_info = course["SWV_CLASS_SEARCH_INSTRCTR_JSON"]
-        if instructor_info:
-            instructor_data = json.loads(instructor_info)
-            instructor_name = instructor_data[0]["NAME"] if instructor_data else "No instructor assigned"
-        else:
-            instructor_name = "No instructor assigned"
-            
-        return {
-            "CRN": course["SWV_CLASS_SEARCH_CRN"],
-            "Subject": course["SWV_CLASS_SEARCH_SUBJECT"],
-            "Course": course["SWV_CLASS_SEARCH_COURSE"],
-            "Section": course["SWV_CLASS_SEARCH_SECTION"],
-            "Title": course["SWV_CLASS_SEARCH_TITLE"],
-            "Instructor": instructor_name,
-            "Status": "Open" if course["STUSEAT_OPEN"] == "Y" else "Closed",
-            "Location": course["SWV_CLASS_SEARCH_ATTRIBUTES"]
-        }
+        return Section(
+            course["SWV_CLASS_SEARCH_CRN"],
+            course["SWV_CLASS_SEARCH_SUBJECT"],
+            course["SWV_CLASS_SEARCH_COURSE"],
+            course["SWV_CLASS_SEARCH_SECTION"],
+            course["SWV_CLASS_SEARCH_TITLE"],
+            _instructor_name(course["SWV_CLASS_SEARCH_INSTRCTR_JSON"]),
+            "Open" if course["STUSEAT_OPEN"] == "Y" else "Closed",
+            course["SWV_CLASS_SEARCH_ATTRIBUTES"]
+        )
     except Exception as e:
         print(f"Error formatting course: {e}")
         return None
 
+
 async def format_status_message(sections: List[Dict]) -> str:
     message = "Current course status:\n\n"
     for section in sections:
@@ -0,0 +1,58 @@
+from typing import Dict, List, Optional
+import os
+import time
+import logging
+from .fetch_planner import FetchPlan, plan_fetches
+
+
+class WatchSet:
+    """The active watches and their fetch plan, cached between check cycles
+
+    Loading every watch is a full scan plus a sections join, too much for
+    every tick. Whoever changes which watches are active, or what they're
+    linked to, calls mark_changed(); that stamps a status record, so a tick
+    costs one key lookup until something changed on any worker. The cache is
+    also reloaded every `refresh` seconds to pick up anything else.
+    """
+
+    NAME = "watches"
+
+    def __init__(self, db, refresh: Optional[float] = None):
+        self.db = db
+        self.refresh = refresh or float(os.getenv("WATCH_REFRESH_SECONDS", "60"))
+        self.watches: List[Dict] = []
+        self.plan: FetchPlan = FetchPlan()
+        self._loaded_at: Optional[float] = None
+        self._changed_at = None
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    async def mark_changed(self):
+        """Make every worker's cache reload on its next load()"""
+        self.invalidate()
+        try:
+            await self.db.put_status(self.NAME, {})
+        except Exception as e:
+            logging.error(f"Failed to mark watches changed: {str(e)}")
+
+    async def load(self) -> FetchPlan:
+        """Return the plan of all active watches, reloading them only if they may have changed"""
+        now = time.monotonic()
+        try:
+            status = await self.db.get_status(self.NAME)
+            changed_at = status["updated_at"] if status else None
+        except Exception as e:
+            logging.error(f"Failed to read watches status: {str(e)}")
+            # Without the marker only the refresh interval catches other workers' changes
+            changed_at = self._changed_at
+
+        if self._loaded_at is None or changed_at != self._changed_at or now - self._loaded_at >= self.refresh:
+            # Initializing watches belong to the init queue, failed ones are never checked
+            self.watches = [w for w in await self.db.get_all_watches() if w.get('status') == 'active']
+            # One upstream query per distinct course (or per term for CRN watches)
+            self.plan = plan_fetches(self.watches)
+            # An empty load may be an error get_all_watches swallowed, and is cheap to redo
+            self._loaded_at = now if self.watches else None
+            self._changed_at = changed_at
+        return self.plan
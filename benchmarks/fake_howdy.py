@@ -0,0 +1,166 @@
+"""Local stand-in for the Howdy course-sections API
+
+    python -m benchmarks.fake_howdy --port 8900 --subjects 40 --latency 0.2
+
+Point the app at it with HOWDY_URL=http://127.0.0.1:8900/api/course-sections.
+Besides the API it serves a few control endpoints for the benchmark runner:
+
+    GET  /_stats   request, row and byte counters since the last reset
+    POST /_reset   zero the counters
+    POST /_churn   flip the seat status of a fraction of sections
+"""
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import json
+import random
+from aiohttp import web
+from app.utils import DEFAULT_TERM
+
+INSTRUCTORS = [json.dumps([{"NAME": f"Instructor {i}"}]) for i in range(200)]
+
+
+class Catalog:
+    """Deterministic set of sections shared by the fake server and the watch generator"""
+
+    def __init__(self, subjects: int = 40, courses_per_subject: int = 25, sections_per_course: int = 6,
+                 open_fraction: float = 0.3, padding: int = 0, seed: int = 0, term: str = DEFAULT_TERM):
+        rng = random.Random(seed)
+        self.term = term
+        self.courses: List[tuple] = []
+        self.rows: List[Dict] = []
+        crn = 10000
+        for s in range(subjects):
+            subject = f"S{s:03d}"
+            for c in range(courses_per_subject):
+                course = str(100 + c * 7)
+                crns = []
+                for n in range(sections_per_course):
+                    row = {
+                        "SWV_CLASS_SEARCH_CRN": str(crn),
+                        "SWV_CLASS_SEARCH_SUBJECT": subject,
+                        "SWV_CLASS_SEARCH_COURSE": course,
+                        "SWV_CLASS_SEARCH_SECTION": f"{500 + n}",
+                        "SWV_CLASS_SEARCH_TITLE": f"{subject} Topics {course}",
+                        "SWV_CLASS_SEARCH_INSTRCTR_JSON": rng.choice(INSTRUCTORS),
+                        "STUSEAT_OPEN": "Y" if rng.random() < open_fraction else "N",
+                        "SWV_CLASS_SEARCH_ATTRIBUTES": "Face to Face",
+                        "SWV_CLASS_SEARCH_TERM": term,
+                        "SWV_CLASS_SEARCH_HOURS_LOW": 3,
+                        "SWV_CLASS_SEARCH_SITE": "College Station"
+                    }
+                    if padding:
+                        # Real rows carry dozens of fields the app never reads
+                        row["SWV_CLASS_SEARCH_JSON_CLOB"] = "x" * padding
+                    self.rows.append(row)
+                    crns.append(str(crn))
+                    crn += 1
+                self.courses.append((subject, course, crns))
+
+    def __len__(self):
+        return len(self.rows)
+
+
+class FakeHowdy:
+    """aiohttp application serving a Catalog with configurable latency, errors and churn"""
+
+    def __init__(self, catalog: Catalog, latency: float = 0.05, jitter: float = 0.02,
+                 error_rate: float = 0.0, seed: int = 0):
+        self.catalog = catalog
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.by_course: Dict[tuple, List[Dict]] = {}
+        for row in catalog.rows:
+            key = (row["SWV_CLASS_SEARCH_SUBJECT"], row["SWV_CLASS_SEARCH_COURSE"])
+            self.by_course.setdefault(key, []).append(row)
+        self.reset()
+
+    def reset(self):
+        self.stats = {"requests": 0, "term_requests": 0, "course_requests": 0, "errors": 0, "rows": 0, "bytes": 0}
+
+    def churn(self, fraction: float) -> int:
+        """Flip the status of `fraction` of all sections; returns how many flipped"""
+        count = round(len(self.catalog.rows) * fraction)
+        for row in self.rng.sample(self.catalog.rows, count):
+            row["STUSEAT_OPEN"] = "N" if row["STUSEAT_OPEN"] == "Y" else "Y"
+        return count
+
+    async def course_sections(self, request: web.Request) -> web.Response:
+        query = await request.json()
+        self.stats["requests"] += 1
+        await asyncio.sleep(self.latency + self.rng.uniform(0, self.jitter))
+        if self.rng.random() < self.error_rate:
+            self.stats["errors"] += 1
+            return web.Response(status=503, text="Service Unavailable")
+
+        if query.get("subject") and query.get("courseNumber"):
+            self.stats["course_requests"] += 1
+            rows = self.by_course.get((query["subject"], str(query["courseNumber"])), [])
+        else:
+            self.stats["term_requests"] += 1
+            rows = self.catalog.rows if query.get("termCode") == self.catalog.term else []
+        page = rows[query.get("startRow", 0):query.get("endRow", len(rows))]
+
+        body = json.dumps(page).encode()
+        self.stats["rows"] += len(page)
+        self.stats["bytes"] += len(body)
+        return web.Response(body=body, content_type="application/json")
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({**self.stats, "sections": len(self.catalog)})
+
+    async def post_reset(self, request: web.Request) -> web.Response:
+        self.reset()
+        return web.json_response(self.stats)
+
+    async def post_churn(self, request: web.Request) -> web.Response:
+        fraction = float(request.query.get("fraction", "0.01"))
+        return web.json_response({"flipped": self.churn(fraction)})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/api/course-sections", self.course_sections)
+        app.router.add_get("/_stats", self.get_stats)
+        app.router.add_post("/_reset", self.post_reset)
+        app.router.add_post("/_churn", self.post_churn)
+        return app
+
+
+def add_catalog_arguments(parser: argparse.ArgumentParser):
+    """Catalog options shared with the runner so both sides build the same sections"""
+    parser.add_argument("--subjects", type=int, default=40)
+    parser.add_argument("--courses-per-subject", type=int, default=25)
+    parser.add_argument("--sections-per-course", type=int, default=6)
+    parser.add_argument("--padding", type=int, default=0, help="extra bytes per row")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def catalog_from_args(args: argparse.Namespace) -> Catalog:
+    return Catalog(
+        subjects=args.subjects,
+        courses_per_subject=args.courses_per_subject,
+        sections_per_course=args.sections_per_course,
+        padding=args.padding,
+        seed=args.seed
+    )
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.02, help="extra random latency, up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    add_catalog_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = FakeHowdy(catalog_from_args(args), args.latency, args.jitter, args.error_rate, args.seed)
+    print(f"Serving {len(server.catalog)} sections on http://{args.host}:{args.port}/api/course-sections")
+    web.run_app(server.app(), host=args.host, port=args.port, print=None, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Synthetic watch populations over a fake Howdy catalog"""
+from typing import List, Tuple
+import random
+from app.storage import Storage
+from app.utils import CourseWatch, format_course
+from .fake_howdy import Catalog
+
+
+def generate_watches(catalog: Catalog, count: int, crn_fraction: float = 0.4,
+                     skew: float = 1.1, users: int = 0, seed: int = 0) -> List[CourseWatch]:
+    """Generate `count` watches with Zipf-like course popularity
+
+    A `crn_fraction` share watch one to three CRNs of a course; the rest watch
+    the whole course. Emails are drawn from `users` addresses (count // 2 by
+    default), so some users hold several watches.
+    """
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) ** skew for rank in range(len(catalog.courses))]
+    courses = rng.sample(catalog.courses, len(catalog.courses))
+    users = users or max(1, count // 2)
+
+    watches = []
+    for subject, course, crns in rng.choices(courses, weights, k=count):
+        email = f"user{rng.randrange(users)}@example.com"
+        if rng.random() < crn_fraction:
+            picked = rng.sample(crns, min(len(crns), rng.randint(1, 3)))
+            watches.append(CourseWatch(crns=picked, email=email))
+        else:
+            watches.append(CourseWatch(subject=subject, course_number=course, email=email))
+    return watches
+
+
+def watch_form(watch: CourseWatch) -> dict:
+    """Form fields POST /watch expects for a watch"""
+    if watch.crns:
+        return {"crns": ",".join(watch.crns), "email": watch.email}
+    return {"subject": watch.subject, "course_number": watch.course_number, "email": watch.email}
+
+
+async def load_population(db: Storage, catalog: Catalog, watches: List[CourseWatch]) -> int:
+    """Store watches as already initialized, without calling Howdy"""
+    sections = {row["SWV_CLASS_SEARCH_CRN"]: format_course(row) for row in catalog.rows}
+    by_course = {(subject, course): crns for subject, course, crns in catalog.courses}
+    await db.upsert_sections(catalog.term, list(sections.values()))
+
+    ids = await db.add_watches_bulk(watches)
+    active: List[Tuple] = []
+    for watch_id, watch in zip(ids, watches):
+        crns = watch.crns or by_course[(watch.subject, watch.course_number)]
+        active.append((watch_id, [crn for crn in crns if crn in sections]))
+    await db.finish_initialization(active, [])
+    return len(ids)
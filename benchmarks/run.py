@@ -0,0 +1,420 @@
+"""Reproducible load scenarios against a local fake Howdy
+
+    python -m benchmarks.run check --watches 2000 --cycles 5 --churn 0.02
+    python -m benchmarks.run page --watches 5000 --requests 500 --concurrency 20
+    python -m benchmarks.run watch --requests 200 --concurrency 10
+    python -m benchmarks.run startup --requests 10
+    python -m benchmarks.run all --json results.json
+
+Run from the repository root. Every scenario starts benchmarks.fake_howdy in
+a subprocess and points HOWDY_URL at it. Storage defaults to the in-memory
+backend; --storage mongo writes to DATABASE_URL, so only use a scratch
+database. Each scenario reports throughput, p50/p99 latency, upstream Howdy
+calls and peak memory. The same options and seed build the same catalog,
+watches and churn, so two runs of the same tree can be compared.
+
+App settings such as HOWDY_RATE_PER_SECOND or CHECK_CONCURRENCY are read
+from the environment as usual.
+"""
+from typing import Awaitable, Callable, Dict, List, Optional
+from contextlib import redirect_stdout
+from urllib.parse import urlencode
+import argparse
+import asyncio
+import io
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import aiohttp
+from .fake_howdy import add_catalog_arguments, catalog_from_args
+from .population import generate_watches, load_population, watch_form
+
+SCENARIOS = ("check", "page", "watch", "startup")
+
+
+class NullEmailService:
+    """Accepts every email without sending it"""
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send_email(self, to, subject, body):
+        self.sent += 1
+        return True
+
+    async def send_bulk_email(self, recipients, subject, body):
+        self.sent += len(recipients)
+        return True
+
+
+class FakeHowdyProcess:
+    """Runs benchmarks.fake_howdy in a subprocess and talks to its control endpoints"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.port = _free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.url = f"{self.base_url}/api/course-sections"
+        self.process: Optional[subprocess.Popen] = None
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self):
+        a = self.args
+        self.process = subprocess.Popen([
+            sys.executable, "-m", "benchmarks.fake_howdy", "--port", str(self.port),
+            "--latency", str(a.latency), "--jitter", str(a.jitter), "--error-rate", str(a.error_rate),
+            "--subjects", str(a.subjects), "--courses-per-subject", str(a.courses_per_subject),
+            "--sections-per-course", str(a.sections_per_course), "--padding", str(a.padding),
+            "--seed", str(a.seed)
+        ])
+        self.session = aiohttp.ClientSession()
+        for _ in range(100):
+            try:
+                await self.stats()
+                return self
+            except aiohttp.ClientError:
+                await asyncio.sleep(0.1)
+        raise RuntimeError("Fake Howdy server did not start")
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+        self.process.terminate()
+        self.process.wait()
+
+    async def stats(self) -> Dict:
+        async with self.session.get(f"{self.base_url}/_stats") as response:
+            return await response.json()
+
+    async def reset(self):
+        async with self.session.post(f"{self.base_url}/_reset") as response:
+            response.raise_for_status()
+
+    async def churn(self, fraction: float) -> int:
+        async with self.session.post(f"{self.base_url}/_churn", params={"fraction": str(fraction)}) as response:
+            return (await response.json())["flipped"]
+
+
+class Recorder:
+    """Collects per-operation latencies and summarizes them"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.failures = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def record(self, seconds: float, ok: bool = True):
+        self.latencies.append(seconds)
+        if not ok:
+            self.failures += 1
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+
+    def summary(self) -> Dict:
+        ordered = sorted(self.latencies)
+        return {
+            "operations": len(ordered),
+            "failures": self.failures,
+            "seconds": round(self.elapsed, 3),
+            "throughput_per_second": round(len(ordered) / self.elapsed, 2) if self.elapsed else None,
+            "p50_ms": _percentile_ms(ordered, 0.50),
+            "p99_ms": _percentile_ms(ordered, 0.99),
+            "max_ms": _percentile_ms(ordered, 1.0)
+        }
+
+
+def _percentile_ms(ordered: List[float], q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    # Nearest-rank, so p99 of a short run is its slowest sample rather than an interpolation
+    index = min(len(ordered) - 1, max(0, int(q * len(ordered) + 0.999999) - 1))
+    return round(ordered[index] * 1000, 2)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_load(request: Callable[[int], Awaitable[bool]], total: int, concurrency: int) -> Recorder:
+    """Issue `total` requests from `concurrency` concurrent clients"""
+    recorder = Recorder()
+    indexes = iter(range(total))
+
+    async def client():
+        for index in indexes:
+            start = time.perf_counter()
+            try:
+                ok = await request(index)
+            except Exception:
+                ok = False
+            recorder.record(time.perf_counter() - start, ok)
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    recorder.finish()
+    return recorder
+
+
+async def asgi_request(app, method: str, path: str, form: Optional[Dict] = None) -> int:
+    """Call an ASGI app in-process and return the response status"""
+    path, _, query = path.partition("?")
+    body = urlencode(form).encode() if form else b""
+    headers = [(b"host", b"benchmark")]
+    if form:
+        headers.append((b"content-type", b"application/x-www-form-urlencoded"))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": query.encode(), "root_path": "", "headers": headers,
+        "client": ("127.0.0.1", 0), "server": ("benchmark", 80)
+    }
+    sent = False
+    status = 0
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # The client never disconnects; anything waiting for it is cancelled with the request
+        await asyncio.Future()
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def check_scenario(args: argparse.Namespace, fake: FakeHowdyProcess, catalog) -> Dict:
+    """Time CourseChecker.check_courses over a fixed watch population with churn between cycles"""
+    from app.cache import TTLCache
+    from app.check_engine import CheckEngine
+    from app.course_checker import CourseChecker
+    from app.email_sender import EmailSender
+    from app.howdy_client import HowdyClient
+    from app.outbox import OutboxWorker
+    from app.poll_policy import AdaptivePollPolicy
+    from app.storage import create_storage
+
+    db = create_storage()
+    await db.ensure_indexes()
+    await load_population(db, catalog, generate_watches(catalog, args.watches, seed=args.seed))
+    howdy = HowdyClient(url=fake.url)
+    await howdy.start()
+    # Not started: notifications are only enqueued, which is the checker's share of the work
+    outbox = OutboxWorker(db, NullEmailService())
+    checker = CourseChecker(db, EmailSender(outbox.email_service), howdy, CheckEngine(), outbox)
+
+    await fake.reset()
+    recorder = Recorder()
+    flipped = 0
+    try:
+        for cycle in range(args.cycles):
+            if cycle:
+                flipped += await fake.churn(args.churn)
+            if not args.warm:
+                # Cold cycles re-check every query instead of whatever the policy and cache let through
+                checker.poll_policy = AdaptivePollPolicy()
+                howdy.cache = TTLCache()
+            start = time.perf_counter()
+            with redirect_stdout(sys.stdout if args.verbose else io.StringIO()):
+                await checker.check_courses()
+            recorder.record(time.perf_counter() - start)
+            if args.warm and cycle < args.cycles - 1:
+                await asyncio.sleep(args.period)
+        recorder.finish()
+    finally:
+        await howdy.close()
+        await db.close()
+    return {**recorder.summary(), "sections_flipped": flipped}
+
+
+# Imports the app and runs its lifespan startup in a fresh interpreter
+STARTUP_PROBE = """
+import asyncio, json, time
+start = time.perf_counter()
+from app import main
+imported = time.perf_counter()
+
+async def ready():
+    async with main.app.router.lifespan_context(main.app):
+        return time.perf_counter()
+
+print(json.dumps({"import": imported - start, "ready": asyncio.run(ready()) - start}))
+"""
+
+
+async def startup_scenario(args: argparse.Namespace) -> Dict:
+    """Time cold starts: interpreter launch, importing app.main and lifespan startup"""
+    recorder = Recorder()
+    imports = []
+    readies = []
+    for _ in range(args.requests):
+        start = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-c", STARTUP_PROBE,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+        )
+        stdout, _ = await process.communicate()
+        recorder.record(time.perf_counter() - start, process.returncode == 0)
+        if process.returncode == 0:
+            probe = json.loads(stdout.decode().strip().splitlines()[-1])
+            imports.append(probe["import"])
+            readies.append(probe["ready"])
+    recorder.finish()
+    return {
+        **recorder.summary(),
+        "import_p50_ms": _percentile_ms(sorted(imports), 0.5),
+        "ready_p50_ms": _percentile_ms(sorted(readies), 0.5)
+    }
+
+
+async def page_scenario(args: argparse.Namespace, fake: FakeHowdyProcess, main) -> Dict:
+    """Time GET / through the FastAPI app"""
+    await fake.reset()
+    recorder = await run_load(
+        lambda i: _expect(asgi_request(main.app, "GET", "/"), 200),
+        args.requests, args.concurrency
+    )
+    return recorder.summary()
+
+
+async def watch_scenario(args: argparse.Namespace, fake: FakeHowdyProcess, main, catalog) -> Dict:
+    """Time POST /watch, then wait for the init queue to initialize every new watch"""
+    forms = [watch_form(w) for w in generate_watches(catalog, args.requests, seed=args.seed + 1)]
+    await fake.reset()
+    recorder = await run_load(
+        lambda i: _expect(asgi_request(main.app, "POST", "/watch", forms[i]), 303),
+        args.requests, args.concurrency
+    )
+
+    start = time.perf_counter()
+    while time.perf_counter() - start < args.settle_timeout:
+        pending, _ = await main.app.state.services.db.list_watches(status="initializing", limit=1, fields=["status"])
+        if not pending:
+            break
+        await asyncio.sleep(0.05)
+    return {**recorder.summary(), "settle_seconds": round(time.perf_counter() - start, 3)}
+
+
+async def _expect(request: Awaitable[int], status: int) -> bool:
+    return await request == status
+
+
+def _use_sqlite_file(args: argparse.Namespace, scratch: str, name: str):
+    # Each scenario gets its own file so populations don't pile up
+    if args.storage == "sqlite":
+        os.environ["SQLITE_PATH"] = os.path.join(scratch, f"{name}.db")
+
+
+async def run_scenarios(args: argparse.Namespace, scratch: str) -> Dict:
+    catalog = catalog_from_args(args)
+    results = {}
+    async with FakeHowdyProcess(args) as fake:
+        os.environ["HOWDY_URL"] = fake.url
+        scenarios = SCENARIOS if args.scenario == "all" else (args.scenario,)
+
+        async def measure(name, scenario):
+            if args.trace_memory:
+                tracemalloc.start()
+            result = await scenario
+            if args.trace_memory:
+                result["peak_traced_mib"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+                tracemalloc.stop()
+            result.update(await fake.stats())
+            result["peak_rss_mib"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+            results[name] = result
+            _print_result(name, result)
+
+        if "check" in scenarios:
+            _use_sqlite_file(args, scratch, "check")
+            await measure("check", check_scenario(args, fake, catalog))
+
+        if "page" in scenarios or "watch" in scenarios:
+            _use_sqlite_file(args, scratch, "app")
+            with redirect_stdout(sys.stdout if args.verbose else io.StringIO()):
+                from app import main
+            async with main.app.router.lifespan_context(main.app):
+                services = main.app.state.services
+                services.outbox.email_service = NullEmailService()
+                await load_population(services.db, catalog, generate_watches(catalog, args.watches, seed=args.seed))
+                if "page" in scenarios:
+                    await measure("page", page_scenario(args, fake, main))
+                if "watch" in scenarios:
+                    await measure("watch", watch_scenario(args, fake, main, catalog))
+
+        if "startup" in scenarios:
+            _use_sqlite_file(args, scratch, "startup")
+            await fake.reset()
+            await measure("startup", startup_scenario(args))
+    return results
+
+
+def _print_result(name: str, result: Dict):
+    print(
+        f"{name:>6}: {result['operations']} ops in {result['seconds']}s "
+        f"({result['throughput_per_second']}/s, {result['failures']} failed)  "
+        f"p50 {result['p50_ms']}ms  p99 {result['p99_ms']}ms  max {result['max_ms']}ms"
+    )
+    extras = {
+        k: result[k]
+        for k in ("sections_flipped", "settle_seconds", "import_p50_ms", "ready_p50_ms", "peak_traced_mib")
+        if k in result
+    }
+    print(
+        f"        howdy: {result['requests']} requests ({result['course_requests']} course, "
+        f"{result['term_requests']} term, {result['errors']} failed), {result['rows']} rows, "
+        f"{round(result['bytes'] / 2 ** 20, 2)} MiB  |  peak RSS {result['peak_rss_mib']} MiB"
+        + "".join(f"  {k} {v}" for k, v in extras.items())
+    )
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenario", choices=SCENARIOS + ("all",))
+    parser.add_argument("--storage", choices=("memory", "sqlite", "mongo"), default="memory")
+    parser.add_argument("--watches", type=int, default=2000, help="size of the preloaded watch population")
+    parser.add_argument("--cycles", type=int, default=5, help="check cycles to run")
+    parser.add_argument("--churn", type=float, default=0.02, help="fraction of sections flipped between cycles")
+    parser.add_argument("--warm", action="store_true",
+                        help="keep the poll policy and response cache between cycles, like the scheduler")
+    parser.add_argument("--period", type=float, default=5.0, help="seconds between warm cycles")
+    parser.add_argument("--requests", type=int, default=200, help="requests per page/watch scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--settle-timeout", type=float, default=120.0)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="also report the tracemalloc peak (slows everything down)")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the app's own output")
+    add_catalog_arguments(parser)
+    args = parser.parse_args(argv)
+
+    # Settings the app reads at import time have to be in place first
+    os.environ["STORAGE_BACKEND"] = args.storage
+    os.environ["SCHEDULER_ENABLED"] = "false"
+    os.environ.setdefault("SENDGRID_API_KEY", "benchmark")
+    os.environ.setdefault("SENDGRID_FROM_EMAIL", "benchmark@example.com")
+    with tempfile.TemporaryDirectory() as scratch:
+        results = asyncio.run(run_scenarios(args, scratch))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"options": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
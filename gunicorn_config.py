@@ -1,4 +1,8 @@
 workers = 4
 worker_class = "uvicorn.workers.UvicornWorker"
 bind = "0.0.0.0:$PORT"
-timeout = 120 
\ No newline at end of file
+timeout = 120 
+
+# Importing app.main opens no connections, so the master imports it once and
+# forked workers (including respawned ones) start without re-importing
+preload_app = True